@@ -1,25 +1,84 @@
 import customtkinter as ctk
 import subprocess
 import threading
+import tempfile
+import time
+import uuid
 import json
+import hashlib
+import base64
+import mmap
 import os
 import re
+import shutil
+import signal
+import string
+import sys
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit
+import tkinter
 from tkinter import messagebox
-from PIL import Image
+from PIL import Image, ImageOps
 from duckduckgo_search import DDGS
-from concurrent.futures import ThreadPoolExecutor
+from duckduckgo_search.exceptions import RatelimitException, TimeoutException
+from collections import Counter, OrderedDict
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from packaging import version
 
 # --- Constants and Configuration ---
 SETTINGS_FILE = "settings.json"
 CACHE_DIR = "cache"
 IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+COMMAND_CACHE_DIR = os.path.join(CACHE_DIR, "commands")
+INSTALLED_SNAPSHOT_FILE = os.path.join(CACHE_DIR, "installed_apps.json")
 PLACEHOLDER_ICON = "placeholder.png"
+LOGO_CACHE_MAX_ENTRIES, LOGO_CACHE_MAX_BYTES = 400, 32 * 1024 * 1024 # Decoded logos kept in memory
+LOGO_INDEX_FILE = os.path.join(IMAGE_CACHE_DIR, "index.jsonl")
+LOGO_SIZES = (48, 96) # Square RGBA thumbnails stored per logo: normal and HiDPI
+LOGO_ATLAS_ENABLED = True # Pack thumbnails into one mmap-read file per size instead of opening a file per logo
+KEEP_ORIGINAL_LOGOS = False # Set to True to also keep each downloaded logo as it was served
+LOGO_DOWNLOADS_PER_HOST, LOGO_MAX_DOWNLOAD_BYTES = 2, 5 * 1024 * 1024
+LOGO_SEARCH_STATE_FILE = os.path.join(CACHE_DIR, "logo_search.json")
+LOGO_SEARCH_RATE, LOGO_SEARCH_BURST = 0.5, 3 # Image searches per second on average, and how many may go at once
+LOGO_SEARCH_COOLDOWN_BASE, LOGO_SEARCH_COOLDOWN_MAX = 60, 3600 # Seconds without searching after a throttled one, doubling per strike
+LOGO_REFRESH_SECONDS = 30 * 86400 # Logos older than this are revalidated against the URL they came from
+LOGO_PREWARM_WORKERS, LOGO_PREWARM_BACKGROUND_WORKERS = 4, 2 # Concurrent logo fetches when prewarming from the command line / behind the UI
+LOGO_RETRY_BASE_SECONDS, LOGO_RETRY_MAX_SECONDS = 86400, 30 * 86400 # A failed logo search is retried after a day, doubling per failure
+INSTALLED_MAX_AGE_SECONDS = 900 # Opening the Installed Apps tab only refreshes a list older than this
+REQUERY_MAX_APPS = 8 # An action touching more packages than this refreshes the whole list instead of querying each one
+FILTER_DEBOUNCE_MS = 150 # Typing pause before the installed list is filtered again
+FILTER_OFF_THREAD_MIN_APPS = 2000 # Larger installed lists are filtered on a worker thread
+COMMAND_TIMEOUT_SECONDS = 300 # Longest a list, outdated, show or query command may run before it is killed
+SEARCH_TIMEOUT_SECONDS = 30 # Per manager; override with "search_timeout" in settings.json
+COMMAND_CACHE_TTLS = {"list": 600, "outdated": 600, "show": 1800, "search": 3600} # Seconds; override per manager with "cache_ttl" in settings.json
+# Placeholders each *_command may use. Commands not listed here take {package_id}.
+COMMAND_PLACEHOLDERS = {"list_command": set(), "query_command": {"package_id"}, "outdated_command": set(), "search_command": {"query"}}
+# Shell strings are full of braces ("% { $_.Name }", "${HOME}"), so only these exact placeholders are ever filled in them.
+SHELL_PLACEHOLDER_PATTERN = re.compile(r"\{(package_id|query)\}")
+# These string commands went through str.format in earlier versions, so settings written for them may escape braces as {{ }}.
+STR_FORMAT_COMMANDS = {"search_command", "show_command", "install_command", "update_command", "uninstall_command"}
 
 # --- Helper Functions & Parsers ---
 def ensure_dirs():
     os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+    os.makedirs(COMMAND_CACHE_DIR, exist_ok=True)
+
+def write_json_atomically(path, data):
+    write_file_atomically(path, json.dumps(data).encode('utf-8'))
+
+def write_file_atomically(path, data):
+    """Writes bytes to a temp file next to path and renames it into place, so readers never see a partial file."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f: f.write(data)
+        os.replace(temp_path, path)
+    except Exception:
+        try: os.remove(temp_path)
+        except OSError: pass
+        raise
 
 def create_placeholder_image():
     if not os.path.exists(PLACEHOLDER_ICON):
@@ -27,39 +86,170 @@ def create_placeholder_image():
             Image.new('RGB', (64, 64), color=(200, 200, 200)).save(PLACEHOLDER_ICON)
         except Exception as e: print(f"Could not create placeholder image: {e}")
 
-def find_header_and_separator(lines):
-    header_line, header_index = None, -1
-    for i, line in enumerate(lines):
-        if line.strip().startswith("---"):
-            if i > 0: header_line, header_index = lines[i-1], i-1
-            break
-    return header_line, header_index
+def process_startupinfo():
+    if os.name != 'nt': return None
+    startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
 
-def parse_winget_search_output(output):
-    results, lines = [], output.strip().split('\n')
-    header_line, header_index = find_header_and_separator(lines)
-    if not header_line: return []
+def kill_process_tree(process):
+    # With shell=True the real work happens in child processes, which must go too or the pipe stays open.
+    if os.name == 'nt': subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True, startupinfo=process_startupinfo())
+    else:
+        try: os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError: pass
+
+def iter_process_lines(command, startupinfo=None, timeout=None):
+    """Runs a command and yields its stdout line by line while it is still running. The process is killed once timeout seconds have passed."""
+    process = subprocess.Popen(command, shell=isinstance(command, str), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding='utf-8', errors='ignore', startupinfo=startupinfo, start_new_session=os.name != 'nt')
+    expired = threading.Event()
+    deadline = threading.Timer(timeout, lambda: (expired.set(), kill_process_tree(process))) if timeout else None
+    if deadline: deadline.daemon = True; deadline.start()
+    drained = False
     try:
-        name_pos, id_pos = header_line.index("Name"), header_line.index("Id")
-        next_col_pos = header_line.find("Version", id_pos); next_col_pos = next_col_pos if next_col_pos != -1 else len(header_line)
-    except ValueError: return []
-    for line in lines[header_index + 2:]:
-        name, package_id = line[name_pos:id_pos].strip(), line[id_pos:next_col_pos].strip()
-        if name and package_id: results.append({"name": name, "id": package_id})
-    return results
+        for line in process.stdout: yield line.rstrip('\r\n')
+        drained = True
+        if expired.is_set(): raise subprocess.TimeoutExpired(command, timeout)
+    finally:
+        if deadline: deadline.cancel()
+        process.stdout.close()
+        if not drained: kill_process_tree(process) # Consumer stopped early
+        if process.wait() != 0: print(f"Command exited with code {process.returncode}: {command}")
+    return process.returncode
 
-def parse_winget_list_output(output):
-    results, lines = [], output.strip().split('\n')
-    header_line, header_index = find_header_and_separator(lines)
-    if not header_line: return []
+def capture_returncode(lines, status):
+    """Yields from a line generator and stores the exit code it returns in status["returncode"]."""
+    status["returncode"] = yield from lines
+
+def app_key(app):
+    return app['manager'], app['id']
+
+def load_installed_snapshot(path=INSTALLED_SNAPSHOT_FILE):
+    """Returns (refreshed timestamp, apps) from the last completed refresh, or (None, []) if there is none."""
     try:
-        name_pos, id_pos, version_pos, available_pos = (header_line.index("Name"), header_line.index("Id"), header_line.index("Version"), header_line.index("Available"))
-    except ValueError: return []
-    for line in lines[header_index + 2:]:
+        with open(path, 'r', encoding='utf-8') as f: snapshot = json.load(f)
+        return snapshot["refreshed"], snapshot["apps"]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError): return None, []
+
+class FormatTemplate(str):
+    """A string command written for str.format, with literal braces escaped as {{ }}."""
+
+def compile_command_templates(managers):
+    """Validates command templates once. Argv-style (list) templates are stored as tuples; string templates stay strings for the shell."""
+    for name, config in managers.items():
+        for key in [key for key in config if key.endswith("_command")]:
+            template = config[key]
+            allowed = COMMAND_PLACEHOLDERS.get(key, {"package_id"})
+            try:
+                if isinstance(template, str):
+                    if not template.strip(): raise ValueError("expected a non-empty command")
+                    for field in SHELL_PLACEHOLDER_PATTERN.findall(template):
+                        if field not in allowed: raise ValueError(f"unknown placeholder {{{field}}}")
+                    if key in STR_FORMAT_COMMANDS and ("{{" in template or "}}" in template):
+                        try: fields = {field for _, field, _, _ in string.Formatter().parse(template) if field is not None}
+                        except ValueError: continue # Not valid str.format syntax, so the braces are the shell's own
+                        if fields <= allowed: config[key] = FormatTemplate(template)
+                    continue
+                if not isinstance(template, list) or not template or not all(isinstance(arg, str) for arg in template): raise ValueError("expected a non-empty list of strings")
+                for arg in template:
+                    for _, field, _, _ in string.Formatter().parse(arg):
+                        if field is not None and field not in allowed: raise ValueError(f"unknown placeholder {{{field}}}")
+                config[key] = tuple(template)
+            except ValueError as e:
+                print(f"Ignoring {name}.{key}: {e}"); del config[key]
+    return managers
+
+def format_command(template, **fields):
+    """Fills a command template. Strings only get their {package_id}/{query} placeholders replaced and go to the shell; tuples become an argv list run without one."""
+    if isinstance(template, FormatTemplate): return template.format(**fields)
+    if isinstance(template, str): return SHELL_PLACEHOLDER_PATTERN.sub(lambda match: str(fields.get(match.group(1), match.group(0))), template)
+    return [arg.format(**fields) for arg in template]
+
+def iter_batches(rows, max_size=25, max_delay=0.1):
+    """Groups rows into lists, flushing when a batch is full or has waited max_delay seconds."""
+    batch, started = [], time.monotonic()
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= max_size or time.monotonic() - started >= max_delay:
+            yield batch
+            batch, started = [], time.monotonic()
+    if batch: yield batch
+
+def iter_table_lines(lines, locate_columns):
+    """Yields (columns, line) for every row below the '---' separator. Column offsets are located once from the header line."""
+    previous, columns = None, None
+    for line in lines:
+        if columns is not None: yield columns, line; continue
+        if line.strip().startswith("---"):
+            if previous is None: return
+            try: columns = locate_columns(previous)
+            except ValueError: return
+        else: previous = line
+
+def winget_search_columns(header_line):
+    name_pos, id_pos = header_line.index("Name"), header_line.index("Id")
+    next_col_pos = header_line.find("Version", id_pos)
+    return name_pos, id_pos, next_col_pos if next_col_pos != -1 else len(header_line)
+
+def winget_list_columns(header_line):
+    # Available ends at Source; winget leaves the Available column out entirely when nothing listed has an update.
+    version_pos, source_pos = header_line.index("Version"), header_line.find("Source")
+    end_pos = source_pos if source_pos != -1 else len(header_line)
+    available_pos = header_line.find("Available", version_pos)
+    return header_line.index("Name"), header_line.index("Id"), version_pos, available_pos if available_pos != -1 else end_pos, end_pos
+
+def winget_upgrade_columns(header_line):
+    source_pos = header_line.find("Source")
+    return header_line.index("Name"), header_line.index("Id"), header_line.index("Version"), header_line.index("Available"), source_pos if source_pos != -1 else len(header_line)
+
+def iter_winget_search_rows(lines):
+    for (name_pos, id_pos, next_col_pos), line in iter_table_lines(lines, winget_search_columns):
+        name, package_id = line[name_pos:id_pos].strip(), line[id_pos:next_col_pos].strip()
+        if name and package_id: yield {"name": name, "id": package_id}
+
+def iter_winget_list_rows(lines):
+    for (name_pos, id_pos, version_pos, available_pos, source_pos), line in iter_table_lines(lines, winget_list_columns):
         name, package_id = line[name_pos:id_pos].strip(), line[id_pos:version_pos].strip()
         if name and package_id:
-            results.append({"name": name, "id": package_id, "version": line[version_pos:available_pos].strip(), "update_available": bool(line[available_pos:].strip())})
-    return results
+            yield {"name": name, "id": package_id, "version": line[version_pos:available_pos].strip(), "update_available": bool(line[available_pos:source_pos].strip())}
+
+def iter_winget_upgrade_rows(lines):
+    for (name_pos, id_pos, version_pos, available_pos, source_pos), line in iter_table_lines(lines, winget_upgrade_columns):
+        name, package_id, installed = line[name_pos:id_pos].strip(), line[id_pos:version_pos].strip(), line[version_pos:available_pos].strip()
+        if not (name and package_id and installed): break # The summary line ("3 upgrades available.") ends the table
+        yield {"name": name, "id": package_id, "version": installed, "available": line[available_pos:source_pos].strip()}
+
+def parse_winget_search_output(output):
+    return list(iter_winget_search_rows(output.strip().split('\n')))
+
+def parse_winget_list_output(output):
+    return list(iter_winget_list_rows(output.strip().split('\n')))
+
+def parse_winget_upgrade_output(output):
+    return list(iter_winget_upgrade_rows(output.strip().split('\n')))
+
+def apply_outdated_versions(apps, outdated):
+    """Sets update_available on apps from a batch listing of {lowercase package id: available version}. Returns the apps it cannot answer."""
+    unanswered, truncated = [], [key for key in outdated if key.endswith('…')]
+    # winget truncates long ids to fit the table, in the list and the upgrade output alike
+    claims = Counter(key for app in apps if app['id'].lower() not in outdated for key in truncated if app['id'].lower().startswith(key[:-1]))
+    for app in apps:
+        package_id = app['id'].lower()
+        available = outdated.get(package_id)
+        if available is None:
+            keys = [k for k in outdated if package_id.endswith('…') and k.startswith(package_id[:-1])] + [k for k in truncated if package_id.startswith(k[:-1])]
+            if len(keys) > 1 or any(claims[k] > 1 for k in keys): unanswered.append(app); continue # Ambiguous; the show fallback settles it
+            available = outdated[keys[0]] if keys else None
+        app['update_available'] = available is not None
+        if available: app['available_version'] = available
+    return unanswered
+
+def find_package_row(rows, package_id):
+    """The row for package_id in a listing; a winget id truncated to fit the table only counts if it is unambiguous."""
+    package_id = package_id.lower()
+    for row in rows:
+        if row['id'].lower() == package_id: return row
+    matches = [row for row in rows if row['id'].endswith('…') and package_id.startswith(row['id'][:-1].lower())]
+    return matches[0] if len(matches) == 1 else None
 
 def parse_winget_show_output(output):
     versions = {}
@@ -71,15 +261,878 @@ def parse_winget_show_output(output):
             elif key == "Installed Version": versions['installed'] = value.strip()
     return versions
 
+def iter_choco_list_rows(lines):
+    for line in lines:
+        parts = line.split()
+        if len(parts) == 2: yield {"name": parts[0].strip(), "id": parts[0].strip(), "version": parts[1].strip(), "update_available": False}
+
 def parse_choco_list_output(output):
+    return list(iter_choco_list_rows(output.strip().split('\n')))
+
+def parse_choco_outdated_output(output):
+    # `choco outdated -r` prints one "id|current|available|pinned" line per outdated package
     results = []
     for line in output.strip().split('\n'):
-        parts = line.split()
-        if len(parts) == 2: results.append({"name": parts[0].strip(), "id": parts[0].strip(), "version": parts[1].strip(), "update_available": False})
+        parts = line.strip().split('|')
+        if len(parts) >= 3 and parts[0] and parts[3:4] != ['true']: results.append({"name": parts[0], "id": parts[0], "version": parts[1], "available": parts[2]})
+    return results
+
+def scoop_list_columns(header_line):
+    return header_line.index("Name"), header_line.index("Version")
+
+def iter_scoop_list_rows(lines):
+    for _, line in iter_table_lines(lines, scoop_list_columns):
+        if len(parts := line.split()) >= 2: yield {"name": parts[0], "id": parts[0], "version": parts[1], "update_available": False}
+
+def parse_scoop_list_output(output):
+    return list(iter_scoop_list_rows(output.strip().split('\n')))
+
+def scoop_status_columns(header_line):
+    latest_pos = header_line.index("Latest Version")
+    next_col_pos = header_line.find("Missing", latest_pos)
+    return header_line.index("Name"), header_line.index("Installed Version"), latest_pos, next_col_pos if next_col_pos != -1 else len(header_line)
+
+def parse_scoop_status_output(output):
+    lines, results = output.strip().split('\n'), []
+    # Older scoop releases print "name: installed -> latest" lines instead of a table
+    for line in lines:
+        if match := re.match(r'^\s*(\S+): (\S+) -> (\S+)', line): results.append({"name": match[1], "id": match[1], "version": match[2], "available": match[3]})
+    for (name_pos, installed_pos, latest_pos, next_col_pos), line in iter_table_lines(lines, scoop_status_columns):
+        name, latest = line[name_pos:installed_pos].strip(), line[latest_pos:next_col_pos].strip()
+        if name and latest: results.append({"name": name, "id": name, "version": line[installed_pos:latest_pos].strip(), "available": latest})
     return results
 
 # Add other parsers as needed...
-PARSER_MAPPING = {"winget_list": parse_winget_list_output, "winget_search": parse_winget_search_output, "choco_list": parse_choco_list_output}
+PARSER_MAPPING = {"winget_list": parse_winget_list_output, "winget_search": parse_winget_search_output, "winget_upgrade": parse_winget_upgrade_output, "choco_list": parse_choco_list_output, "choco_outdated": parse_choco_outdated_output, "scoop_list": parse_scoop_list_output, "scoop_status": parse_scoop_status_output}
+# Line-based variants of the parsers above, fed directly from a running process.
+# What a single-package query prints when the package isn't installed, by list_parser. Without a table or one of these, a query that found nothing is taken to have failed.
+QUERY_NOT_INSTALLED_PATTERNS = {"winget_list": re.compile(r"No installed package found", re.I), "choco_list": re.compile(r"^\s*0 packages installed", re.I | re.M),
+                                "scoop_list": re.compile(r"No (?:matching |installed )?apps? (?:found|installed|matching)|isn't installed", re.I)}
+STREAM_PARSER_MAPPING = {"winget_list": iter_winget_list_rows, "winget_search": iter_winget_search_rows, "winget_upgrade": iter_winget_upgrade_rows, "choco_list": iter_choco_list_rows, "scoop_list": iter_scoop_list_rows}
+
+# --- Persistent Shell Hosts ---
+# Each dialect describes how to start a long-lived shell that reads commands from stdin, how to recognise a
+# settings.json command meant for that shell, and how to wrap a script so its output ends with a sentinel line.
+SHELL_HOST_DIALECTS = {
+    "powershell": {"argv": ["powershell", "-NoLogo", "-NoProfile", "-NonInteractive", "-Command", "-"],
+                   "setup": "[Console]::OutputEncoding = [System.Text.Encoding]::UTF8\n",
+                   "wrapper": r'^\s*powershell(?:\.exe)?\s+-Command\s+"(.*)"\s*$',
+                   # The script arrives base64-encoded, so a parse error, throw or exit in it can't swallow the sentinel
+                   "template": '$LASTEXITCODE = 0; $failed = $false; try {{ & ([ScriptBlock]::Create([Text.Encoding]::UTF8.GetString([Convert]::FromBase64String("{encoded}")))) }} '
+                               'catch {{ $failed = $true; [Console]::Error.WriteLine($_) }} finally {{ Write-Output "{sentinel} $(if ($failed -and -not $LASTEXITCODE) {{ 1 }} else {{ [int]$LASTEXITCODE }})" }}\n'},
+    "bash": {"argv": ["bash", "--norc", "--noprofile"], "setup": "",
+             "wrapper": r'^\s*(?:ba)?sh\s+-c\s+"(.*)"\s*$',
+             # eval in a subshell: an exit or a syntax error in the script ends only the subshell, and the sentinel always prints
+             "template": '( eval "$(echo {encoded} | base64 -d)" ) </dev/null; echo "{sentinel} $?"\n'},
+}
+SHELL_POOL_SIZE = 4
+
+class ShellHostError(RuntimeError): pass
+
+class ShellHost:
+    """A long-lived shell process that runs one script at a time and marks the end of its output with a sentinel."""
+    def __init__(self, dialect):
+        self.dialect, self.timed_out, self.broken, self.sent = dialect, False, False, False
+        self.process = subprocess.Popen(dialect["argv"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, encoding='utf-8', errors='ignore', bufsize=1, startupinfo=process_startupinfo(), start_new_session=os.name != 'nt')
+        if dialect["setup"]: self.send(dialect["setup"])
+
+    def alive(self):
+        return not self.broken and self.process.poll() is None
+
+    def send(self, text):
+        try: self.process.stdin.write(text); self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as e: self.broken = True; raise ShellHostError(f"Shell host is not accepting input: {e}")
+
+    def kill(self):
+        self.broken = True
+        if self.process.poll() is None: kill_process_tree(self.process)
+
+    def iter_lines(self, script, timeout=COMMAND_TIMEOUT_SECONDS):
+        """Yields the output lines of script. Returns its exit code when the generator finishes."""
+        sentinel = f"__TIWUT_DONE_{uuid.uuid4().hex}__"
+        self.sent = False
+        self.send(self.dialect["template"].format(encoded=base64.b64encode(script.encode('utf-8')).decode('ascii'), sentinel=sentinel))
+        self.sent = True
+        deadline = threading.Timer(timeout or COMMAND_TIMEOUT_SECONDS, self.expire)
+        deadline.daemon = True; deadline.start()
+        finished = False
+        try:
+            for line in self.process.stdout:
+                line = line.rstrip('\r\n')
+                if sentinel in line:
+                    before, _, code = line.partition(sentinel)
+                    if before: yield before
+                    finished = True
+                    try: return int(code.strip() or 0)
+                    except ValueError: return 1
+                yield line
+            raise ShellHostError("Shell host timed out." if self.timed_out else "Shell host exited unexpectedly.")
+        finally:
+            deadline.cancel()
+            if not finished: self.kill() # Unread output would leak into the next script
+
+    def expire(self):
+        self.timed_out = True; self.kill()
+
+class ShellHostPool:
+    """A small pool of ShellHosts, started on demand and replaced when they die."""
+    def __init__(self, dialect_name, size=SHELL_POOL_SIZE):
+        self.dialect, self.size = SHELL_HOST_DIALECTS[dialect_name], size
+        self.wrapper = re.compile(self.dialect["wrapper"], re.DOTALL)
+        self.idle, self.hosts, self.closed = [], set(), False
+        self.condition = threading.Condition()
+
+    @classmethod
+    def for_platform(cls, size=SHELL_POOL_SIZE):
+        """Returns a pool for the platform's shell, or None if that shell is not installed."""
+        dialect_name = "powershell" if os.name == 'nt' else "bash"
+        return cls(dialect_name, size) if shutil.which(SHELL_HOST_DIALECTS[dialect_name]["argv"][0]) else None
+
+    def unwrap(self, command):
+        """Returns the script inside a command like 'powershell -Command "..."', or None if the command is not for this shell."""
+        match = self.wrapper.match(command)
+        return match.group(1).replace('\\"', '"') if match else None
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                if self.closed: raise ShellHostError("Shell host pool is closed.")
+                while self.idle:
+                    host = self.idle.pop()
+                    if host.alive(): return host
+                    self.hosts.discard(host); print("Shell host died, starting a replacement.")
+                if len(self.hosts) < self.size: break
+                self.condition.wait()
+            host = ShellHost(self.dialect)
+            self.hosts.add(host)
+            return host
+
+    def release(self, host):
+        with self.condition:
+            if host.alive() and not self.closed: self.idle.append(host)
+            else: host.kill(); self.hosts.discard(host)
+            self.condition.notify()
+
+    def iter_lines(self, script, timeout=COMMAND_TIMEOUT_SECONDS):
+        """Yields the output lines of script from a pooled host. A host that was already dead when the script was sent is
+        replaced and the script retried once; a script that ran is never run a second time."""
+        for attempt in range(2):
+            host = self.acquire()
+            lines = host.iter_lines(script, timeout)
+            try:
+                while True:
+                    try: line = next(lines)
+                    except StopIteration as stop: returncode = stop.value; break
+                    yield line
+                if returncode: print(f"Shell command exited with code {returncode}: {script}")
+                return returncode
+            except ShellHostError:
+                if host.sent or attempt: raise
+                print("Shell host crashed, retrying on a fresh host.")
+            finally: lines.close(); self.release(host)
+
+    def run(self, script, timeout=COMMAND_TIMEOUT_SECONDS):
+        """Runs script on a pooled host and returns (returncode, output)."""
+        lines = []
+        generator = self.iter_lines(script, timeout)
+        try:
+            while True: lines.append(next(generator))
+        except StopIteration as stop: return stop.value, '\n'.join(lines)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for host in self.hosts: host.kill()
+            self.idle, self.hosts = [], set(); self.condition.notify_all()
+
+# --- Command Output Cache ---
+class CommandCache:
+    """Parsed command results on disk, one JSON file per (manager, kind, arguments). Entries expire after a per-kind TTL."""
+    def __init__(self, directory=COMMAND_CACHE_DIR):
+        self.directory = directory
+
+    def prefix(self, manager, kind):
+        return f"{re.sub('[^a-zA-Z0-9]', '', manager)}-{kind}-"
+
+    def path(self, manager, kind, args):
+        digest = hashlib.sha1(json.dumps([manager, kind, args]).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"{self.prefix(manager, kind)}{digest}.json")
+
+    def get(self, manager, kind, args, ttl):
+        try:
+            with open(self.path(manager, kind, args), 'r', encoding='utf-8') as f: entry = json.load(f)
+        except (OSError, json.JSONDecodeError): return None
+        if time.time() - entry.get("created", 0) > ttl: return None
+        return entry.get("value")
+
+    def put(self, manager, kind, args, value):
+        try: write_json_atomically(self.path(manager, kind, args), {"created": time.time(), "value": value})
+        except OSError as e: print(f"Could not cache {manager} {kind} output: {e}")
+
+    def invalidate(self, manager, kinds):
+        prefixes = tuple(self.prefix(manager, kind) for kind in kinds)
+        try: file_names = os.listdir(self.directory)
+        except OSError: return
+        for file_name in file_names:
+            if file_name.startswith(prefixes):
+                try: os.remove(os.path.join(self.directory, file_name))
+                except OSError: pass
+
+# --- Installed App Filter ---
+class InstalledAppFilter:
+    """A normalized index over name, id, version and manager. Queries are whitespace-separated terms that must all match,
+    plus the qualifiers manager:<prefix> (any of them may match) and has:update."""
+    def __init__(self, apps):
+        self.entries = [(app, "\n".join(str(app.get(field) or "") for field in ("name", "id", "version", "manager")).casefold()) for app in apps]
+        self.last_query, self.last_entries = None, self.entries
+
+    @staticmethod
+    def parse(query):
+        terms, managers, updates = [], [], False
+        for token in query.casefold().split():
+            if token.startswith("manager:") and len(token) > len("manager:"): managers.append(token[len("manager:"):])
+            elif token == "has:update": updates = True
+            else: terms.append(token)
+        return terms, tuple(managers), updates
+
+    @staticmethod
+    def narrows(query, previous):
+        """True if everything matching query also matched previous, so only the previous result needs scanning."""
+        terms, managers, updates = query
+        previous_terms, previous_managers, previous_updates = previous
+        if not all(any(old in new for new in terms) for old in previous_terms): return False
+        if previous_updates and not updates: return False
+        return not previous_managers or bool(managers) and all(new.startswith(previous_managers) for new in managers)
+
+    def filter(self, query):
+        parsed = self.parse(query); terms, managers, updates = parsed
+        candidates = self.last_entries if self.last_query is not None and self.narrows(parsed, self.last_query) else self.entries
+        matches = [(app, text) for app, text in candidates if all(term in text for term in terms)
+                   and (not managers or str(app.get('manager', '')).casefold().startswith(managers)) and (not updates or app.get('update_available'))]
+        self.last_query, self.last_entries = parsed, matches
+        return [app for app, _ in matches]
+
+# --- Logo Loading ---
+def logo_key(app_name):
+    """Normalizes an app name for logo lookups, so "Git" and "git " share one logo while "C++" and "C#" stay apart."""
+    return " ".join(app_name.casefold().split())
+
+def make_logo_thumbnails(source, sizes=LOGO_SIZES):
+    """Decodes an image (a path or binary file) once and returns {size: PNG bytes of it centered on a transparent
+    size x size square}. Raises ValueError if source isn't an image."""
+    try:
+        with Image.open(source) as image:
+            largest = max(sizes)
+            image.draft(None, (largest, largest)) # JPEGs decode straight at a reduced scale
+            image = image.convert("RGBA")
+            if (factor := min(image.size) // (2 * largest)) > 1: image = image.reduce(factor) # Cheap box downscale before LANCZOS
+            thumbnails = {}
+            for size in sizes:
+                square = Image.new("RGBA", (size, size))
+                fitted = ImageOps.contain(image, (size, size), Image.Resampling.LANCZOS)
+                square.paste(fitted, ((size - fitted.width) // 2, (size - fitted.height) // 2))
+                out = BytesIO(); square.save(out, "PNG"); thumbnails[size] = out.getvalue()
+            return thumbnails
+    except Exception as e: raise ValueError(f"not an image: {e}") from e
+
+class LogoIndex:
+    """An append-only manifest of logo lookups: normalized name -> thumbnails (named by the content hash of the original),
+    source URL, fetch time and failure count. The last line for a name wins; the file is compacted on load once mostly stale."""
+    def __init__(self, path=LOGO_INDEX_FILE):
+        self.path, self.directory = path, os.path.dirname(path)
+        self.lock, self.entries, self.lines = threading.Lock(), {}, 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: entry = json.loads(line); self.entries[entry["name"]] = entry
+                    except (json.JSONDecodeError, KeyError, TypeError): continue
+                    self.lines += 1
+        except OSError: return
+        if self.lines > 2 * len(self.entries) + 100: self.compact()
+
+    def compact(self):
+        with self.lock:
+            try: write_file_atomically(self.path, "".join(json.dumps(entry) + "\n" for entry in self.entries.values()).encode('utf-8'))
+            except OSError as e: print(f"Could not compact the logo index: {e}"); return
+            self.lines = len(self.entries)
+
+    def lookup(self, name, size=LOGO_SIZES[0]):
+        """Returns (path of the cached thumbnail or None, whether a search is due). Failed lookups back off before retrying."""
+        with self.lock: entry = self.entries.get(name)
+        if entry is None: return None, True
+        if not entry.get("thumbnails") and entry.get("file"): # Indexed before thumbnails were stored
+            try:
+                original = os.path.join(self.directory, entry["file"])
+                with open(original, 'rb') as f: self.store(name, f.read(), entry.get("url"))
+                with self.lock: entry, still_used = self.entries[name], any(other.get("file") == os.path.basename(original) for other in self.entries.values())
+                if not KEEP_ORIGINAL_LOGOS and not still_used: os.remove(original)
+            except (OSError, ValueError): return None, True
+        if thumbnail := (entry.get("thumbnails") or {}).get(str(size)):
+            path = os.path.join(self.directory, thumbnail)
+            return (path, False) if os.path.exists(path) else (None, True)
+        retry_after = min(LOGO_RETRY_MAX_SECONDS, LOGO_RETRY_BASE_SECONDS * 2 ** (entry.get("failures", 1) - 1))
+        return None, time.time() - entry.get("fetched", 0) >= retry_after
+
+    def store(self, name, data, url=None):
+        """Saves thumbnails of the image bytes under their content hash and records them for name. Returns the path of the
+        smallest thumbnail. Raises ValueError if data isn't an image."""
+        content_hash = hashlib.sha1(data).hexdigest()
+        thumbnails = self.write_thumbnails(content_hash, BytesIO(data))
+        original = None
+        if KEEP_ORIGINAL_LOGOS:
+            original = f"{content_hash}.orig"
+            if not os.path.exists(os.path.join(self.directory, original)): write_file_atomically(os.path.join(self.directory, original), data)
+        return self.record_thumbnails(name, content_hash, thumbnails, original, url)
+
+    def store_download(self, name, temp_path, content_hash, url=None, validators=None):
+        """Like store, for a file from LogoDownloader in this directory: it is renamed into place as the original when those
+        are kept, and removed otherwise. validators are the response's etag and last_modified, for conditional refreshes."""
+        try:
+            thumbnails = self.write_thumbnails(content_hash, temp_path)
+            original = None
+            if KEEP_ORIGINAL_LOGOS: original = f"{content_hash}.orig"; os.replace(temp_path, os.path.join(self.directory, original))
+        finally:
+            try: os.remove(temp_path)
+            except OSError: pass
+        return self.record_thumbnails(name, content_hash, thumbnails, original, url, validators)
+
+    def write_thumbnails(self, content_hash, source):
+        thumbnails = {str(size): f"{content_hash}-{size}.png" for size in LOGO_SIZES}
+        if not all(os.path.exists(os.path.join(self.directory, file_name)) for file_name in thumbnails.values()): # Identical logos share files
+            for size, png in make_logo_thumbnails(source).items(): write_file_atomically(os.path.join(self.directory, thumbnails[str(size)]), png)
+        return thumbnails
+
+    def record_thumbnails(self, name, content_hash, thumbnails, original, url, validators=None):
+        self.record({"name": name, "hash": content_hash, "thumbnails": thumbnails, "file": original, "url": url, "fetched": time.time(), "failures": 0, **(validators or {})})
+        return os.path.join(self.directory, thumbnails[str(LOGO_SIZES[0])])
+
+    def content_hash(self, name):
+        with self.lock: entry = self.entries.get(name)
+        return entry.get("hash") if entry and entry.get("thumbnails") else None
+
+    def content_hashes(self):
+        with self.lock: return {entry["hash"] for entry in self.entries.values() if entry.get("thumbnails")}
+
+    def source(self, name):
+        """The URL a logo was downloaded from, with its etag and last_modified validators, or None if there is none."""
+        with self.lock: entry = self.entries.get(name)
+        return {key: entry.get(key) for key in ("url", "etag", "last_modified")} if entry and entry.get("thumbnails") and entry.get("url") else None
+
+    def refresh_due(self, name):
+        with self.lock: entry = self.entries.get(name)
+        return bool(entry and entry.get("thumbnails") and entry.get("url")) and time.time() - entry.get("fetched", 0) > LOGO_REFRESH_SECONDS
+
+    def touch(self, name, **changes):
+        """Marks a logo as checked just now, optionally changing other fields of its entry."""
+        with self.lock: entry = dict(self.entries[name])
+        entry.update(changes, fetched=time.time()); self.record(entry)
+
+    def record_failure(self, name, url=None):
+        with self.lock: previous = self.entries.get(name) or {}
+        failures = 1 if previous.get("thumbnails") or previous.get("file") else previous.get("failures", 0) + 1
+        self.record({"name": name, "file": None, "url": url, "fetched": time.time(), "failures": failures})
+
+    def record(self, entry):
+        with self.lock:
+            self.entries[entry["name"]] = entry
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f: f.write(json.dumps(entry) + "\n")
+                self.lines += 1
+            except OSError as e: print(f"Could not update the logo index: {e}")
+
+class SearchThrottled(RuntimeError): pass
+
+class DDGSImageBackend:
+    """The default image search backend: one DuckDuckGo session shared by all callers, one request at a time."""
+    def __init__(self):
+        self.lock, self.ddgs = threading.Lock(), None
+
+    def images(self, query, max_results=1):
+        with self.lock:
+            if self.ddgs is None: self.ddgs = DDGS()
+            try: return list(self.ddgs.images(query, max_results=max_results))
+            except (RatelimitException, TimeoutException) as e: raise SearchThrottled(str(e)) from e
+
+class LogoSearchClient:
+    """Image search for logos through a pluggable backend (anything with images(query, max_results) that raises
+    SearchThrottled when refused). A token bucket spaces requests out, and each throttled response starts a cooldown that
+    doubles per consecutive strike. The cooldown is persisted, so a restart doesn't hit the service again straight away."""
+    def __init__(self, backend=None, rate=LOGO_SEARCH_RATE, burst=LOGO_SEARCH_BURST, state_path=LOGO_SEARCH_STATE_FILE):
+        self.backend, self.rate, self.burst, self.state_path = backend or DDGSImageBackend(), rate, burst, state_path
+        self.lock, self.tokens, self.refilled = threading.Lock(), burst, time.monotonic()
+        self.cooldown_until, self.strikes = 0.0, 0
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f: state = json.load(f)
+            self.cooldown_until, self.strikes = float(state["cooldown_until"]), int(state["strikes"])
+        except (OSError, json.JSONDecodeError, KeyError, TypeError, ValueError): pass
+
+    def acquire(self):
+        """Blocks until a token is free. Raises SearchThrottled while a cooldown is running."""
+        while True:
+            with self.lock:
+                if time.time() < self.cooldown_until: raise SearchThrottled(f"cooling down until {time.strftime('%H:%M:%S', time.localtime(self.cooldown_until))}")
+                now = time.monotonic()
+                self.tokens, self.refilled = min(self.burst, self.tokens + (now - self.refilled) * self.rate), now
+                if self.tokens >= 1: self.tokens -= 1; return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def images(self, query, max_results=1):
+        self.acquire()
+        try: results = self.backend.images(query, max_results)
+        except SearchThrottled as e:
+            with self.lock:
+                if time.time() >= self.cooldown_until: # Requests already in flight when the first was refused don't add strikes
+                    self.strikes += 1
+                    self.cooldown_until = time.time() + min(LOGO_SEARCH_COOLDOWN_MAX, LOGO_SEARCH_COOLDOWN_BASE * 2 ** (self.strikes - 1))
+                    print(f"Logo search throttled ({e}); pausing searches until {time.strftime('%H:%M:%S', time.localtime(self.cooldown_until))}.")
+                    self.save_state()
+            raise
+        if self.strikes:
+            with self.lock: self.strikes = 0; self.save_state()
+        return results
+
+    def save_state(self):
+        try: write_json_atomically(self.state_path, {"cooldown_until": self.cooldown_until, "strikes": self.strikes})
+        except OSError as e: print(f"Could not save logo search state: {e}")
+
+class LogoDownloader:
+    """Fetches logos through one pooled requests session, running at most per_host downloads against any one host.
+    Bodies stream to a temp file under a hard byte limit and must be served with an image content type."""
+    def __init__(self, per_host=LOGO_DOWNLOADS_PER_HOST, max_bytes=LOGO_MAX_DOWNLOAD_BYTES, timeout=10):
+        self.per_host, self.max_bytes, self.timeout = per_host, max_bytes, timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self.session.mount("http://", adapter); self.session.mount("https://", adapter)
+        self.lock, self.host_slots = threading.Lock(), {} # host -> semaphore bounding its concurrent downloads
+
+    def host_slot(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self.lock: return self.host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+
+    def download(self, url, directory, etag=None, last_modified=None):
+        """Streams url into a temp file in directory and returns (temp path, SHA-1 hex digest, {etag, last_modified}); the
+        caller renames or removes the file. Given validators, returns None if the server answers 304 Not Modified.
+        Raises ValueError if the response isn't an image or is too large, and requests exceptions for other failures."""
+        headers = {key: value for key, value in (("If-None-Match", etag), ("If-Modified-Since", last_modified)) if value}
+        with self.host_slot(url), self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+            if response.status_code == 304 and headers: return None
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+            if not content_type.startswith("image/"): raise ValueError(f"served as {content_type or 'an unknown type'}")
+            if int(response.headers.get("Content-Length") or 0) > self.max_bytes: raise ValueError(f"larger than {self.max_bytes} bytes")
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+            try:
+                digest, received = hashlib.sha1(), 0
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(64 * 1024):
+                        received += len(chunk)
+                        if received > self.max_bytes: raise ValueError(f"larger than {self.max_bytes} bytes")
+                        digest.update(chunk); f.write(chunk)
+                return temp_path, digest.hexdigest(), {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+            except BaseException:
+                try: os.remove(temp_path)
+                except OSError: pass
+                raise
+
+    def close(self):
+        self.session.close()
+
+class LogoAtlas:
+    """Thumbnails of one size packed into a single file of fixed-size records (SHA-1 digest, then raw RGBA pixels) and
+    read through mmap. The offset index is rebuilt from the record headers on open; new logos are appended."""
+    def __init__(self, path, size, live_hashes=None):
+        self.path, self.size, self.pixels = path, size, size * size * 4
+        self.record_size = 20 + self.pixels
+        self.lock, self.offsets, self.map = threading.Lock(), {}, None # content hash -> offset of its pixels
+        try: self.load()
+        except (OSError, ValueError) as e: print(f"Could not open logo atlas {path}: {e}")
+        # Compact once dead records (logos no longer in the index) make up most of the file
+        if live_hashes is not None and len(self.offsets.keys() - live_hashes) > max(64, len(self.offsets) // 2): self.compact(live_hashes)
+
+    def load(self):
+        if self.map: self.map.close(); self.map = None
+        with open(self.path, 'a+b') as f:
+            length = os.fstat(f.fileno()).st_size
+            if length % self.record_size: length -= length % self.record_size; f.truncate(length) # Drop a torn append
+        self.map_file()
+        self.offsets = {self.map[offset:offset + 20].hex(): offset + 20 for offset in range(0, len(self.map), self.record_size)} if self.map else {}
+
+    def map_file(self):
+        if self.map: self.map.close(); self.map = None
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size: self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def get(self, content_hash):
+        """Returns the packed thumbnail as a PIL image, or None if it isn't packed."""
+        with self.lock:
+            offset = self.offsets.get(content_hash)
+            if offset is None: return None
+            try:
+                if not self.map or offset + self.pixels > len(self.map): self.map_file() # Appended since the file was mapped
+                data = self.map[offset:offset + self.pixels]
+            except (OSError, ValueError) as e: print(f"Could not read logo atlas {self.path}: {e}"); return None
+        return Image.frombytes("RGBA", (self.size, self.size), data)
+
+    def add(self, content_hash, image):
+        if image.mode != "RGBA" or image.size != (self.size, self.size): return
+        with self.lock:
+            if content_hash in self.offsets: return
+            try:
+                with open(self.path, 'ab') as f: offset = f.seek(0, os.SEEK_END); f.write(bytes.fromhex(content_hash) + image.tobytes())
+            except OSError as e: print(f"Could not append to logo atlas {self.path}: {e}"); return
+            self.offsets[content_hash] = offset + 20
+
+    def compact(self, live_hashes):
+        with self.lock:
+            try:
+                live = b"".join(self.map[offset - 20:offset + self.pixels] for content_hash, offset in self.offsets.items() if content_hash in live_hashes)
+                self.map.close(); self.map = None # A mapped file can't be replaced on Windows
+                write_file_atomically(self.path, live)
+            except (OSError, ValueError) as e: print(f"Could not compact logo atlas {self.path}: {e}")
+            try: self.load()
+            except (OSError, ValueError) as e: print(f"Could not open logo atlas {self.path}: {e}")
+
+class LogoScheduler:
+    """Queues logo jobs per logo_key and, each time a worker frees up, starts the one whose rows are most visible (lowest
+    logo_priority on their labels, oldest first). Jobs whose labels have all moved on to another app are dropped."""
+    def __init__(self, executor, run_job):
+        self.executor, self.run_job = executor, run_job
+        self.lock, self.pending, self.sequence = threading.Lock(), {}, 0 # key -> (sequence, [(label, app name)])
+
+    @staticmethod
+    def priority(label, app_name):
+        return getattr(label, 'logo_priority', 0) if getattr(label, 'logo_key', app_name) == app_name else None
+
+    def submit(self, key, app_name, label):
+        with self.lock:
+            if key in self.pending: self.pending[key][1].append((label, app_name)); return
+            self.sequence += 1; self.pending[key] = (self.sequence, [(label, app_name)])
+        self.executor.submit(self.run_next) # One run per job, so every job gets a turn even though any job may be picked
+
+    def run_next(self):
+        with self.lock:
+            best = None
+            for key, (sequence, waiters) in list(self.pending.items()):
+                priorities = [p for p in (self.priority(label, app_name) for label, app_name in waiters) if p is not None]
+                if not priorities: del self.pending[key]
+                elif best is None or (min(priorities), sequence) < best[0]: best = ((min(priorities), sequence), key)
+            if best is None: return
+            key = best[1]; waiters = [(label, app_name) for label, app_name in self.pending.pop(key)[1] if self.priority(label, app_name) is not None]
+        self.run_job(key, waiters)
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one; every caller's callback receives that call's result."""
+    def __init__(self):
+        self.lock, self.waiters = threading.Lock(), {} # key -> callbacks waiting on the call in flight
+
+    def run(self, key, work, callback):
+        with self.lock:
+            if key in self.waiters: self.waiters[key].append(callback); return
+            self.waiters[key] = [callback]
+        result = None
+        try: result = work()
+        finally:
+            with self.lock: callbacks = self.waiters.pop(key)
+            for waiting in callbacks: waiting(result)
+
+class LogoCache:
+    """Decoded logos by logo_key, least recently used first out once either bound is exceeded. Logos pinned by a row
+    are never evicted, since the row's label still displays them."""
+    def __init__(self, max_entries=LOGO_CACHE_MAX_ENTRIES, max_bytes=LOGO_CACHE_MAX_BYTES):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.lock, self.entries, self.pins = threading.Lock(), OrderedDict(), {} # key -> (image, estimated bytes); key -> pin count
+        self.size, self.hits, self.misses, self.evictions = 0, 0, 0, 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None: self.misses += 1; return None
+            self.hits += 1; self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, image, size=0):
+        """Stores image under key; size is its estimated decoded bytes (0 for an image shared with other keys)."""
+        with self.lock:
+            if key in self.entries: self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (image, size); self.size += size
+            for old_key in [k for k in self.entries if k not in self.pins]:
+                if len(self.entries) <= self.max_entries and self.size <= self.max_bytes: break
+                self.size -= self.entries.pop(old_key)[1]; self.evictions += 1
+
+    def pin(self, key):
+        with self.lock: self.pins[key] = self.pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        with self.lock:
+            if self.pins.get(key, 0) > 1: self.pins[key] -= 1
+            else: self.pins.pop(key, None)
+
+    def stats(self):
+        with self.lock: return {"entries": len(self.entries), "bytes": self.size, "pinned": len(self.pins), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+class LogoStore:
+    """Finds, downloads and stores logo thumbnails with no UI involved: the index and atlases under IMAGE_CACHE_DIR, the
+    pooled downloader and the rate-limited search client. Used by the app's logo workers and by the prewarm."""
+    def __init__(self):
+        self.index, self.downloader, self.search = LogoIndex(), LogoDownloader(), LogoSearchClient()
+        self.atlases = {size: LogoAtlas(os.path.join(IMAGE_CACHE_DIR, f"logos-{size}.pack"), size, self.index.content_hashes()) for size in LOGO_SIZES} if LOGO_ATLAS_ENABLED else {}
+
+    def thumbnail(self, app_name, size=LOGO_SIZES[0]):
+        """Returns the app's logo as a square RGBA image of the given size, fetching it first if needed, or None."""
+        key = logo_key(app_name)
+        if self.index.refresh_due(key) and self.refresh(app_name, key, conditional=True) is False:
+            # The URL is gone; a new search may find a replacement, but the logo already stored stays until one is found.
+            if not self.fetch(app_name, key, record_failures=False): self.index.touch(key, url=None)
+        atlas, content_hash = self.atlases.get(size), self.index.content_hash(key)
+        if atlas and content_hash and (packed := atlas.get(content_hash)): return packed
+        img_path, search_due = self.index.lookup(key, size)
+        legacy_path = os.path.join(IMAGE_CACHE_DIR, f"{re.sub('[^a-zA-Z0-9]', '', app_name)}.png") # Named by earlier versions
+        if img_path is None and search_due and os.path.exists(legacy_path): img_path = self.adopt_legacy(key, legacy_path, size)
+        if img_path is None and search_due and self.index.source(key) and self.refresh(app_name, key, conditional=False):
+            img_path, search_due = self.index.lookup(key, size) # Downloaded again from the URL found before
+        if img_path and (image := self.load(img_path, self.index.content_hash(key))): return image
+        if search_due and self.fetch(app_name, key) and (img_path := self.index.lookup(key, size)[0]): return self.load(img_path, self.index.content_hash(key))
+        return None
+
+    def known_missing(self, key):
+        """True if a search recently found no usable logo, so none is looked for until its backoff runs out."""
+        path, search_due = self.index.lookup(key)
+        return path is None and not search_due
+
+    def adopt_legacy(self, key, legacy_path, size):
+        try:
+            with open(legacy_path, 'rb') as f: self.index.store(key, f.read())
+        except (OSError, ValueError) as e: print(f"Could not adopt cached logo {legacy_path}: {e}"); return None
+        try: os.remove(legacy_path)
+        except OSError: pass
+        return self.index.lookup(key, size)[0]
+
+    def refresh(self, app_name, key, conditional):
+        """Downloads a logo again from the URL it was found at; conditionally, when its thumbnails are still stored.
+        Returns False if the URL no longer serves a usable image, so the caller can search instead, and None if it couldn't be reached."""
+        source = self.index.source(key)
+        validators = (source["etag"], source["last_modified"]) if conditional else ()
+        try:
+            if (download := self.downloader.download(source["url"], IMAGE_CACHE_DIR, *validators)) is None: self.index.touch(key); return True
+            self.index.store_download(key, *download[:2], source["url"], download[2])
+            return True
+        except (requests.HTTPError, ValueError) as e: print(f"Logo URL for {app_name} no longer works: {e}"); return False
+        except Exception as e: print(f"Could not refresh logo for {app_name}: {e}"); return None
+
+    def fetch(self, app_name, key, record_failures=True):
+        """Searches for and downloads a logo; True once it is stored. Only answers that no usable logo exists are recorded
+        as failures; network errors are not, so the next lookup tries again."""
+        image_url = None
+        try:
+            results = self.search.images(f"{app_name} logo icon filetype:png", max_results=1)
+            if not results or not (image_url := results[0].get('image')):
+                if record_failures: self.index.record_failure(key)
+                return False
+            temp_path, content_hash, validators = self.downloader.download(image_url, IMAGE_CACHE_DIR)
+            self.index.store_download(key, temp_path, content_hash, image_url, validators)
+            return True
+        except (requests.HTTPError, ValueError) as e:
+            print(f"No usable logo for {app_name}: {e}")
+            if record_failures: self.index.record_failure(key, image_url)
+        except SearchThrottled: pass # Reported once by the search client
+        except Exception as e: print(f"Could not fetch logo for {app_name}: {e}")
+        return False
+
+    def load(self, path, content_hash=None):
+        try:
+            with Image.open(path) as image: image = image.convert("RGBA") if image.mode != "RGBA" else image.copy()
+        except Exception as e: print(f"Failed to load image from {path}: {e}"); return None
+        if content_hash and (atlas := self.atlases.get(image.width)): atlas.add(content_hash, image) # Next start reads it from the atlas
+        return image
+
+    def needs_prewarm(self, app_name):
+        key = logo_key(app_name)
+        if self.index.refresh_due(key): return True
+        img_path, search_due = self.index.lookup(key)
+        if img_path is None: return search_due
+        content_hash = self.index.content_hash(key)
+        return any(content_hash not in atlas.offsets for atlas in self.atlases.values())
+
+    def prewarm(self, app_names, workers=LOGO_PREWARM_WORKERS, report=print, should_pause=None, flights=None):
+        """Fetches and thumbnails every missing logo for app_names (packing each size into the atlases) with at most
+        workers fetches at a time, reporting progress and throughput every few seconds. should_pause, if given, is polled
+        before each fetch so foreground work can go first; flights, if given, is the SingleFlight the rows fetch through,
+        so a logo is never fetched by both at once. Returns (fetched, without a logo, already cached, known to have none)."""
+        names = list({logo_key(name): name for name in app_names}.values())
+        todo = [name for name in names if self.needs_prewarm(name)]
+        def fetch(name): return all([self.thumbnail(name, size) is not None for size in LOGO_SIZES])
+        def warm(name):
+            while should_pause and should_pause(): time.sleep(0.5)
+            if flights is None: return fetch(name)
+            ran, landed = [], threading.Event()
+            flights.run(logo_key(name), lambda: ran.append(fetch(name)) or ran[0], lambda result: landed.set())
+            landed.wait()
+            return ran[0] if ran else fetch(name) # Joined a row's fetch; its result is an image, so read the now cached logo back
+        ready, started, last_report = 0, time.monotonic(), 0.0
+        report(f"Prewarming logos: {len(todo)} of {len(names)} apps need fetching.")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for done, future in enumerate(as_completed([executor.submit(warm, name) for name in todo]), 1):
+                try: ready += future.result()
+                except Exception as e: print(f"Exception prewarming a logo: {e}")
+                elapsed = time.monotonic() - started
+                if elapsed - last_report >= 2 or done == len(todo):
+                    last_report = elapsed
+                    report(f"Prewarming logos: {done}/{len(todo)} ({ready} found, {done - ready} without a logo), {done / max(elapsed, 0.001):.1f} logos/s")
+        known_missing = sum(self.known_missing(logo_key(name)) for name in names if name not in todo)
+        return ready, len(todo) - ready, len(names) - len(todo) - known_missing, known_missing
+
+    def close(self):
+        self.downloader.close()
+
+def prewarm_logos_headless(snapshot_path=INSTALLED_SNAPSHOT_FILE, workers=LOGO_PREWARM_WORKERS):
+    """Fills IMAGE_CACHE_DIR for the apps in a saved snapshot without opening the window, e.g. when building a machine
+    image. Returns the process exit code."""
+    ensure_dirs()
+    refreshed, apps = load_installed_snapshot(snapshot_path)
+    if refreshed is None: print(f"No installed apps snapshot at {snapshot_path}. Open the Installed Apps tab once, or copy a snapshot there."); return 1
+    logo_store = LogoStore()
+    try: ready, missing, cached, known_missing = logo_store.prewarm([app['name'] for app in apps], workers)
+    finally: logo_store.close()
+    print(f"Logo cache ready: {ready} fetched, {missing} without a logo, {cached} already cached, {known_missing} already known to have no logo.")
+    return 0
+
+# --- Virtualized App List ---
+ROW_HEIGHT = 68 # Logical pixels per row in a VirtualAppList, including the gap to the next row
+RENDER_BUDGET_SECONDS = 0.008 # Row building per frame; the rest continues on the next turn of the event loop
+
+class AppRow(ctk.CTkFrame):
+    """One recyclable package row: logo slot, name and ID labels, and the install/update/uninstall buttons."""
+    def __init__(self, master, app_store, mode):
+        super().__init__(master)
+        self.app_store, self.mode, self.app, self.signature = app_store, mode, None, None
+        self.grid_columnconfigure(1, weight=1)
+        self.logo_label = ctk.CTkLabel(self, text="", width=48, height=48)
+        self.logo_label.logo_key, self.logo_label.logo_priority = None, 2 # The app whose logo it wants; 0 in view, 1 near it, 2 hidden
+        self.logo_label.grid(row=0, column=0, rowspan=2, padx=10, pady=5)
+        info_frame = ctk.CTkFrame(self, fg_color="transparent")
+        info_frame.grid(row=0, column=1, rowspan=2, sticky="w", padx=5)
+        self.name_label = ctk.CTkLabel(info_frame, text="", anchor="w", font=ctk.CTkFont(size=14, weight="bold"))
+        self.name_label.pack(anchor="w")
+        self.id_label = ctk.CTkLabel(info_frame, text="", anchor="w", text_color="gray")
+        self.id_label.pack(anchor="w")
+        button_frame = ctk.CTkFrame(self, fg_color="transparent")
+        button_frame.grid(row=0, column=2, rowspan=2, padx=10, pady=5)
+        self.install_button = ctk.CTkButton(button_frame, text="Install", width=90, command=lambda: self.run_action('install'))
+        self.update_button = ctk.CTkButton(button_frame, text="Update", width=90, fg_color="#E67E22", hover_color="#D35400", command=lambda: self.run_action('update'))
+        self.uninstall_button = ctk.CTkButton(button_frame, text="Uninstall", width=90, fg_color="#c0392b", hover_color="#e74c3c", command=lambda: self.run_action('uninstall'))
+        if mode == "install": self.install_button.pack()
+        elif mode == "manage": self.uninstall_button.pack(side="left")
+
+    def run_action(self, action_type):
+        if self.app: self.app_store.start_package_action_thread(self.app, action_type)
+
+    def bind_app(self, app):
+        busy = app_key(app) in self.app_store.busy_apps
+        signature = (app['name'], app['id'], app['manager'], app.get('version'), app.get('update_available'), app.get('available_version'), busy)
+        name_changed = self.app is None or self.app['name'] != app['name']
+        if name_changed: # The row's logo stays in memory for as long as the row shows it
+            if self.app: self.app_store.logo_cache.unpin(logo_key(self.app['name']))
+            self.app_store.logo_cache.pin(logo_key(app['name']))
+        self.app = app # Actions always use the latest record, even when nothing visible changed
+        if self.logo_label.logo_key != app['name']:
+            self.logo_label.logo_key = app['name']
+            # Logos already in memory are applied directly; only a miss goes to the logo workers.
+            if image := self.app_store.logo_cache.get(logo_key(app['name'])): self.logo_label.configure(image=image)
+            else:
+                if placeholder := self.app_store.logo_cache.get("placeholder"): self.logo_label.configure(image=placeholder)
+                self.app_store.fetch_logo_thread(app['name'], self.logo_label)
+        if signature == self.signature: return
+        self.signature = signature
+        self.name_label.configure(text=app['name'])
+        id_text = f"ID: {app['id']} (via {app['manager']})"
+        if 'version' in app: id_text += f" | v{app['version']}"
+        if app.get('update_available') and app.get('available_version'): id_text += f" → v{app['available_version']}"
+        self.id_label.configure(text=id_text)
+        if self.mode == "manage":
+            if app.get('update_available'): self.update_button.pack(side="left", padx=(0, 5), before=self.uninstall_button)
+            else: self.update_button.pack_forget()
+        for button in (self.install_button, self.update_button, self.uninstall_button): button.configure(state="disabled" if busy else "normal")
+
+class VirtualAppList(ctk.CTkFrame):
+    """A scrollable list of apps that only materializes rows near the viewport and recycles them while scrolling."""
+    def __init__(self, master, make_row, label_text="", overscan=2, **kwargs):
+        super().__init__(master, **kwargs)
+        self.make_row, self.overscan = make_row, overscan
+        self.items, self.empty_text, self.offset = [], "", 0
+        self.visible_rows, self.spare_rows = {}, [] # index -> AppRow on screen; rows waiting to be reused
+        self.render_after_id = None
+        self.grid_rowconfigure(1, weight=1); self.grid_columnconfigure(0, weight=1)
+        if label_text: ctk.CTkLabel(self, text=label_text, font=ctk.CTkFont(weight="bold")).grid(row=0, column=0, columnspan=2, padx=5, pady=(5, 0), sticky="ew")
+        self.viewport = ctk.CTkFrame(self, fg_color="transparent")
+        self.viewport.grid(row=1, column=0, padx=(5, 0), pady=5, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.yview)
+        self.scrollbar.grid(row=1, column=1, padx=3, pady=5, sticky="ns")
+        self.empty_label = ctk.CTkLabel(self.viewport, text="")
+        self.viewport.bind("<Configure>", lambda e: self.render())
+        # CTk widgets refuse bind_all, so the app-wide wheel binding goes through tkinter itself; on_mousewheel keeps only events over this list.
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"): tkinter.Misc.bind_all(self, sequence, self.on_mousewheel, add="+")
+
+    def set_items(self, items, empty_text="", keep_position=False):
+        self.items, self.empty_text = list(items), empty_text
+        if not keep_position: self.offset = 0
+        self.render()
+
+    def append_items(self, items):
+        self.items.extend(items)
+        self.render()
+
+    def view_height(self):
+        return self.viewport.winfo_height() / ctk.ScalingTracker.get_widget_scaling(self)
+
+    def yview(self, action, value, unit=None):
+        if action == "moveto": self.offset = float(value) * len(self.items) * ROW_HEIGHT
+        elif action == "scroll": self.offset += int(value) * (self.view_height() if unit == "pages" else ROW_HEIGHT)
+        self.render()
+
+    def on_mousewheel(self, event):
+        widget_path = str(event.widget)
+        if widget_path != str(self) and not widget_path.startswith(str(self) + "."): return
+        if widget_path == str(self.scrollbar) or widget_path.startswith(str(self.scrollbar) + "."): return # CTkScrollbar scrolls on its own wheel events
+        if event.num == 4 or event.delta > 0: self.yview("scroll", -1, "units")
+        elif event.num == 5 or event.delta < 0: self.yview("scroll", 1, "units")
+
+    def render(self):
+        """Places the rows around the viewport, building and binding them in time-boxed batches from the top of the view down."""
+        if self.render_after_id: self.after_cancel(self.render_after_id); self.render_after_id = None
+        view_height, content_height = self.view_height(), len(self.items) * ROW_HEIGHT
+        self.offset = max(0, min(self.offset, content_height - view_height))
+        first = max(0, int(self.offset // ROW_HEIGHT) - self.overscan)
+        last = min(len(self.items), int((self.offset + view_height) // ROW_HEIGHT) + 1 + self.overscan)
+        for index in [index for index in self.visible_rows if not first <= index < last]: self.hide_row(self.visible_rows.pop(index))
+        if content_height: self.scrollbar.set(self.offset / content_height, min(1.0, (self.offset + view_height) / content_height))
+        else: self.scrollbar.set(0.0, 1.0)
+        if self.items or not self.empty_text: self.empty_label.place_forget()
+        else: self.empty_label.configure(text=self.empty_text); self.empty_label.place(relx=0.5, y=20, anchor="n")
+        # Rows in view come first, top down (the most relevant apps are sorted to the top), then the overscan above.
+        top, bottom = max(first, int(self.offset // ROW_HEIGHT)), min(last, int((self.offset + view_height) // ROW_HEIGHT) + 1)
+        order = list(range(top, last)) + list(range(top - 1, first - 1, -1))
+        deadline = time.perf_counter() + RENDER_BUDGET_SECONDS
+        for position, index in enumerate(order):
+            if position and time.perf_counter() > deadline:
+                # Rows still showing another app are hidden until their turn, so no button acts on the wrong package.
+                for index in order[position:]:
+                    row = self.visible_rows.get(index)
+                    if row and row.app is not self.items[index]: del self.visible_rows[index]; self.hide_row(row)
+                    elif row: self.show_row(row, index, top <= index < bottom)
+                self.render_after_id = self.after(1, self.render); return
+            row = self.visible_rows.get(index) or (self.spare_rows.pop() if self.spare_rows else self.make_row(self.viewport))
+            self.visible_rows[index] = row
+            self.show_row(row, index, top <= index < bottom) # Before binding, so a logo job it queues is ranked by where it is
+            row.bind_app(self.items[index])
+
+    def show_row(self, row, index, in_view):
+        row.logo_label.logo_priority = 0 if in_view else 1
+        row.place(x=0, y=index * ROW_HEIGHT - self.offset, relwidth=1.0)
+
+    def hide_row(self, row):
+        row.logo_label.logo_priority = 2 # Its queued logo job waits behind every row on or near the screen
+        row.place_forget(); self.spare_rows.append(row)
 
 class AppStore(ctk.CTk):
     def __init__(self):
@@ -89,19 +1142,28 @@ class AppStore(ctk.CTk):
         ctk.set_appearance_mode("System")
         ctk.set_default_color_theme("blue")
 
-        self.all_installed_apps = []
+        self.all_installed_apps, self.sorted_installed_apps, self.installed_filter_term = [], None, ""
+        self.installed_filter, self.filter_after_id, self.filter_generation = None, None, 0
         self.package_managers = self.load_settings()
         ensure_dirs()
         create_placeholder_image()
-        self.logo_cache, self.source_checkbox_vars = {}, {}
+        self.logo_cache, self.source_checkbox_vars = LogoCache(), {}
+        self.logo_cache.pin("placeholder")
+        self.load_image_from_path(PLACEHOLDER_ICON, "placeholder")
+        self.search_generation, self.busy_apps = 0, set() # busy_apps: app_key of every package with an action running
+        self.installed_refreshed_at, self.installed_dirty, self.installed_refresh_running = None, False, False
         self.thread_pool = ThreadPoolExecutor(max_workers=10)
+        self.logo_flights, self.logo_store, self.logo_prewarm_started = SingleFlight(), LogoStore(), False
+        self.logo_scheduler = LogoScheduler(self.thread_pool, self.run_logo_job)
+        self.filter_executor = ThreadPoolExecutor(max_workers=1) # One at a time, so a filter can narrow the one before it
+        self.shell_pool = ShellHostPool.for_platform()
+        self.command_cache = CommandCache()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         self.grid_rowconfigure(0, weight=1); self.grid_columnconfigure(0, weight=1)
-        self.tab_view = ctk.CTkTabview(self)
+        self.tab_view = ctk.CTkTabview(self, command=self.on_tab_changed)
         self.tab_view.grid(row=0, column=0, padx=10, pady=10, sticky="nsew")
         self.tab_view.add("Search & Install"); self.tab_view.add("Installed Apps")
-        self.tab_view.tab("Installed Apps").bind("<Visibility>", lambda e: self.populate_installed_apps_tab())
         
         self.setup_search_tab()
         self.setup_installed_tab()
@@ -112,9 +1174,15 @@ class AppStore(ctk.CTk):
         self.status_label = ctk.CTkLabel(bottom_frame, text="Ready.")
         self.status_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
         self.progress_bar = ctk.CTkProgressBar(bottom_frame, mode="indeterminate")
+        self.restore_installed_snapshot()
 
     def on_closing(self):
+        stats = self.logo_cache.stats()
+        print(f"Logo cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions; {stats['entries']} logos ({stats['pinned']} pinned) in {stats['bytes'] / 1e6:.1f} MB")
         self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        self.filter_executor.shutdown(wait=False, cancel_futures=True)
+        if self.shell_pool: self.shell_pool.close()
+        self.logo_store.close()
         self.destroy()
 
     def setup_search_tab(self):
@@ -136,8 +1204,8 @@ class AppStore(ctk.CTk):
                 cb = ctk.CTkCheckBox(source_frame, text=name.capitalize(), variable=var)
                 cb.pack(side="left", padx=5)
                 self.source_checkbox_vars[name] = var
-        self.search_results_frame = ctk.CTkScrollableFrame(tab, label_text="Search Results")
-        self.search_results_frame.grid(row=2, column=0, padx=5, pady=5, sticky="nsew")
+        self.search_results_list = VirtualAppList(tab, lambda parent: AppRow(parent, self, "install"), label_text="Search Results")
+        self.search_results_list.grid(row=2, column=0, padx=5, pady=5, sticky="nsew")
 
     def setup_installed_tab(self):
         tab = self.tab_view.tab("Installed Apps")
@@ -149,24 +1217,27 @@ class AppStore(ctk.CTk):
         
         actions_frame = ctk.CTkFrame(top_bar_frame, fg_color="transparent")
         actions_frame.grid(row=0, column=0, sticky="w")
-        self.refresh_button = ctk.CTkButton(actions_frame, text="Refresh List", command=self.populate_installed_apps_tab)
+        self.refresh_button = ctk.CTkButton(actions_frame, text="Refresh List", command=lambda: self.populate_installed_apps_tab(use_cache=False))
         self.refresh_button.pack(side="left", padx=(0, 10))
         self.update_all_button = ctk.CTkButton(actions_frame, text="Update All", command=self.start_update_all_thread)
         self.update_all_button.pack(side="left")
 
-        self.installed_search_entry = ctk.CTkEntry(top_bar_frame, placeholder_text="Filter installed apps...")
+        self.installed_search_entry = ctk.CTkEntry(top_bar_frame, placeholder_text="Filter installed apps... (manager:scoop, has:update)")
         self.installed_search_entry.grid(row=0, column=1, padx=(20,0), sticky="ew")
-        self.installed_search_entry.bind("<KeyRelease>", self.filter_and_display_installed_apps)
+        self.installed_search_entry.bind("<KeyRelease>", self.on_installed_filter_key)
+        self.last_refreshed_label = ctk.CTkLabel(top_bar_frame, text="", text_color="gray")
+        self.last_refreshed_label.grid(row=0, column=2, padx=(10, 5))
 
-        self.installed_apps_frame = ctk.CTkScrollableFrame(tab, label_text="All Installed Applications (Updates are listed first)")
-        self.installed_apps_frame.grid(row=1, column=0, rowspan=2, padx=5, pady=5, sticky="nsew")
+        self.installed_apps_list = VirtualAppList(tab, lambda parent: AppRow(parent, self, "manage"), label_text="All Installed Applications (Updates are listed first)")
+        self.installed_apps_list.grid(row=1, column=0, rowspan=2, padx=5, pady=5, sticky="nsew")
 
     def load_settings(self):
         try:
-            with open(SETTINGS_FILE, 'r') as f: return json.load(f)
+            with open(SETTINGS_FILE, 'r') as f: managers = json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            # Default settings... (unchanged)
-            return { "winget": { "list_command": 'powershell -Command "winget list"', "show_command": 'powershell -Command "winget show --id \\"{package_id}\\""', "search_command": 'powershell -Command "winget search --query \\"{query}\\" --accept-source-agreements"', "install_command": 'powershell -Command "winget install --id \\"{package_id}\\" --accept-source-agreements"', "update_command": 'powershell -Command "winget upgrade --id \\"{package_id}\\" --accept-source-agreements"', "uninstall_command": 'powershell -Command "winget uninstall --id \\"{package_id}\\" --accept-source-agreements"', "search_parser": "winget_search", "list_parser": "winget_list" }, "chocolatey": { "list_command": 'powershell -Command "choco list --local-only"', "search_command": 'powershell -Command "choco search {query} --limit-output --exact"', "install_command": 'powershell -Command "choco install {package_id} -y"', "update_command": 'powershell -Command "choco upgrade {package_id} -y"', "uninstall_command": 'powershell -Command "choco uninstall {package_id} -y"', "search_parser": "choco_search", "list_parser": "choco_list" }, "scoop": { "list_command": 'powershell -Command "scoop list"', "search_command": 'powershell -Command "scoop search {query}"', "install_command": 'powershell -Command "scoop install {package_id}"', "update_command": 'powershell -Command "scoop update {package_id}"', "uninstall_command": 'powershell -Command "scoop uninstall {package_id}"', "search_parser": "scoop_search", "list_parser": "scoop_list" } }
+            # Default settings. winget and choco are plain executables and run directly from an argv template; scoop is a PowerShell script.
+            managers = { "winget": { "list_command": ["winget", "list"], "query_command": ["winget", "list", "--id", "{package_id}", "--exact", "--accept-source-agreements"], "show_command": ["winget", "show", "--id", "{package_id}"], "search_command": ["winget", "search", "--query", "{query}", "--accept-source-agreements"], "install_command": ["winget", "install", "--id", "{package_id}", "--accept-source-agreements"], "update_command": ["winget", "upgrade", "--id", "{package_id}", "--accept-source-agreements"], "uninstall_command": ["winget", "uninstall", "--id", "{package_id}", "--accept-source-agreements"], "outdated_command": ["winget", "upgrade", "--include-unknown", "--accept-source-agreements"], "search_parser": "winget_search", "list_parser": "winget_list", "outdated_parser": "winget_upgrade" }, "chocolatey": { "list_command": ["choco", "list", "--local-only"], "query_command": ["choco", "list", "--local-only", "--exact", "{package_id}"], "search_command": ["choco", "search", "{query}", "--limit-output", "--exact"], "install_command": ["choco", "install", "{package_id}", "-y"], "update_command": ["choco", "upgrade", "{package_id}", "-y"], "uninstall_command": ["choco", "uninstall", "{package_id}", "-y"], "outdated_command": ["choco", "outdated", "-r"], "search_parser": "choco_search", "list_parser": "choco_list", "outdated_parser": "choco_outdated" }, "scoop": { "list_command": 'powershell -Command "scoop list"', "query_command": 'powershell -Command "scoop list {package_id}"', "search_command": 'powershell -Command "scoop search {query}"', "install_command": 'powershell -Command "scoop install {package_id}"', "update_command": 'powershell -Command "scoop update {package_id}"', "uninstall_command": 'powershell -Command "scoop uninstall {package_id}"', "outdated_command": 'powershell -Command "scoop status"', "search_parser": "scoop_search", "list_parser": "scoop_list", "outdated_parser": "scoop_status" } }
+        return compile_command_templates(managers)
     
     def start_task(self, calling_button=None):
         self.progress_bar.grid(row=0, column=0, padx=(200, 5), pady=5, sticky="ew")
@@ -190,112 +1261,302 @@ class AppStore(ctk.CTk):
         if not selected_sources: self.update_status("Please select at least one source.", "orange"); return
         self.update_status(f"Searching for '{query}'...")
         self.start_task(self.search_button)
-        for widget in self.search_results_frame.winfo_children(): widget.destroy()
-        threading.Thread(target=self.search_worker, args=(query, selected_sources), daemon=True).start()
+        self.search_results_list.set_items([])
+        self.search_generation += 1
+        threading.Thread(target=self.search_worker, args=(query, selected_sources, self.search_generation), daemon=True).start()
 
-    def search_worker(self, query, sources):
+    def search_worker(self, query, sources, generation):
+        # Every source runs concurrently under its own deadline, so a hung manager cannot hold back the others.
+        sources = [name for name in sources if "search_command" in self.package_managers.get(name, {})]
         all_results = []
-        for name in sources:
-            config = self.package_managers.get(name, {})
-            if "search_command" not in config: continue
-            try:
-                command = config["search_command"].format(query=query)
-                process = subprocess.run(command, shell=True, capture_output=True, text=True, encoding='utf-8', errors='ignore', startupinfo=self.get_startupinfo())
-                if process.returncode == 0:
-                    parser = PARSER_MAPPING.get(config.get("search_parser"))
-                    if parser:
-                        parsed = parser(process.stdout)
-                        for res in parsed: res['manager'] = name
-                        all_results.extend(parsed)
-            except Exception as e: print(f"Exception with {name}: {e}")
-        self.after(0, self.display_search_results, all_results)
-
-    def display_search_results(self, results):
+        with ThreadPoolExecutor(max_workers=max(1, len(sources))) as executor:
+            futures = {executor.submit(self.search_source, name, query, generation): name for name in sources}
+            for future in as_completed(futures):
+                try: all_results.extend(future.result())
+                except Exception as e: print(f"Exception with {futures[future]}: {e}")
+        self.after(0, self.display_search_results, all_results, generation)
+
+    def search_source(self, name, query, generation):
+        config = self.package_managers[name]
+        if (results := self.command_cache.get(name, "search", query, self.cache_ttl(name, "search"))) is not None:
+            for batch in iter_batches(results): self.after(0, self.append_search_results, batch, generation)
+            return results
+        command, results = format_command(config["search_command"], query=query), []
+        timeout = config.get("search_timeout", SEARCH_TIMEOUT_SECONDS)
+        try:
+            for batch in iter_batches(self.stream_parsed_rows(command, config.get("search_parser"), timeout)):
+                for res in batch: res['manager'] = name
+                results.extend(batch)
+                self.after(0, self.append_search_results, batch, generation)
+        except Exception as e:
+            # Rows already on screen stay in the final sorted list; a partial answer just isn't cached.
+            print(f"Search with {name} stopped early: {e}"); return results
+        if results: self.command_cache.put(name, "search", query, results) # An empty result may be a failure; don't remember it
+        return results
+
+    def append_search_results(self, results, generation):
+        if generation != self.search_generation: return
+        self.search_results_list.append_items(results)
+        self.update_status(f"Searching... {len(self.search_results_list.items)} results so far.")
+
+    def display_search_results(self, results, generation):
+        if generation != self.search_generation: return
         self.stop_task(self.search_button)
         if not results:
             self.update_status("No applications found.", "orange")
-            ctk.CTkLabel(self.search_results_frame, text="No results found.").pack(pady=20); return
+            self.search_results_list.set_items([], "No results found."); return
         self.update_status(f"Found {len(results)} results.", "green")
-        for result in sorted(results, key=lambda x: x['name'].lower()):
-            self.create_app_entry(self.search_results_frame, result, "install")
+        # Rows were shown in arrival order; sort them by name now that every source has answered.
+        self.search_results_list.set_items(sorted(results, key=lambda x: x['name'].lower()), keep_position=True)
 
     # --- Installed Apps ---
-    def populate_installed_apps_tab(self):
-        self.update_status("Fetching list of installed apps...")
-        self.installed_search_entry.delete(0, "end") # Clear filter on refresh
+    def on_tab_changed(self):
+        if self.tab_view.get() == "Installed Apps": self.ensure_installed_apps_fresh()
+
+    def ensure_installed_apps_fresh(self):
+        """Refreshes only if the list is missing, older than INSTALLED_MAX_AGE_SECONDS, or an action changed the system."""
+        stale = self.installed_refreshed_at is None or time.time() - self.installed_refreshed_at > INSTALLED_MAX_AGE_SECONDS
+        if stale or self.installed_dirty: self.populate_installed_apps_tab()
+
+    def populate_installed_apps_tab(self, use_cache=True, revalidate=False):
+        if self.installed_refresh_running: return # The refresh in flight will deliver fresh results
+        self.installed_refresh_running, self.installed_dirty = True, False
+        self.update_status("Revalidating installed apps..." if revalidate else "Fetching list of installed apps...")
         self.start_task(self.refresh_button)
-        threading.Thread(target=self.list_and_verify_worker, daemon=True).start()
+        threading.Thread(target=self.list_and_verify_worker, args=(use_cache, revalidate, list(self.all_installed_apps)), daemon=True).start()
 
-    def list_and_verify_worker(self):
-        self.all_installed_apps = []
-        for name, config in self.package_managers.items():
-            if "list_command" not in config: continue
-            try:
-                command = config["list_command"]
-                process = subprocess.run(command, shell=True, capture_output=True, text=True, encoding='utf-8', errors='ignore', startupinfo=self.get_startupinfo())
-                if process.returncode == 0:
-                    parser = PARSER_MAPPING.get(config.get("list_parser"))
-                    if parser:
-                        parsed = parser(process.stdout)
-                        for app in parsed: app['manager'] = name
-                        self.all_installed_apps.extend(parsed)
-            except Exception as e: print(f"Exception listing {name}: {e}")
-        
-        self.after(0, self.update_status, "Verifying updates...")
-        apps_to_verify = [app for app in self.all_installed_apps if app.get('update_available') and app.get('manager') == 'winget']
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            executor.map(self.check_single_app_update, apps_to_verify)
-        self.after(0, self.filter_and_display_installed_apps)
+    def list_and_verify_worker(self, use_cache=True, revalidate=False, previous_apps=()):
+        # A revalidation leaves the rows on screen alone and patches only what changed once everything is verified.
+        if not revalidate: self.after(0, self.clear_installed_apps)
+        on_batch = None if revalidate else self.append_installed_apps
+        managers = [name for name, config in self.package_managers.items() if "list_command" in config]
+        batch_checked = [name for name in managers if "outdated_command" in self.package_managers[name]]
+        installed_apps, failed = [], set()
+        # All list commands and batch outdated checks start at once. Per-package verification only runs for packages
+        # the batch check cannot answer, and starts as soon as that manager's packages are known.
+        with ThreadPoolExecutor(max_workers=8) as verify_executor:
+            with ThreadPoolExecutor(max_workers=max(1, len(managers) + len(batch_checked))) as list_executor:
+                outdated_futures = {name: list_executor.submit(self.fetch_outdated, name, use_cache) for name in batch_checked}
+                futures = {list_executor.submit(self.list_manager_apps, name, verify_executor, outdated_futures.get(name), use_cache, on_batch): name for name in managers}
+                for future in as_completed(futures):
+                    try: installed_apps.extend(future.result())
+                    except Exception as e: print(f"Exception listing {futures[future]}: {e}"); failed.add(futures[future])
+            self.after(0, self.update_status, "Verifying updates...")
+        # A manager that failed to list keeps its previous records, on screen and in the snapshot, rather than losing them all.
+        kept = [app for app in previous_apps if app['manager'] in failed]
+        if kept:
+            installed_apps.extend(kept)
+            if on_batch: self.after(0, on_batch, kept)
+        refreshed = time.time()
+        self.save_installed_snapshot(installed_apps, refreshed)
+        if revalidate: self.after(0, self.apply_revalidated_apps, installed_apps, refreshed)
+        else: self.after(0, self.on_installed_apps_refreshed, refreshed)
+
+    def save_installed_snapshot(self, apps, refreshed):
+        try: write_json_atomically(INSTALLED_SNAPSHOT_FILE, {"refreshed": refreshed, "apps": apps})
+        except OSError as e: print(f"Could not save installed apps snapshot: {e}")
+
+    def list_manager_apps(self, name, verify_executor, outdated_future=None, use_cache=True, on_batch=None):
+        config = self.package_managers[name]
+        cached = self.command_cache.get(name, "list", None, self.cache_ttl(name, "list")) if use_cache else None
+        status = {}
+        rows = iter(cached) if cached is not None else self.stream_parsed_rows(format_command(config["list_command"]), config.get("list_parser"), status=status)
+        apps, parsed = [], []
+        for batch in iter_batches(rows):
+            for app in batch: app['manager'] = name
+            apps.extend(batch); parsed.extend(dict(app) for app in batch) # Cache rows as parsed, before verification changes them
+            if on_batch: self.after(0, on_batch, batch)
+            if outdated_future is None: self.verify_individually(batch, verify_executor, use_cache)
+        if not apps and status.get("returncode"): raise RuntimeError(f"list command exited with code {status['returncode']} and listed nothing")
+        if cached is None and parsed: self.command_cache.put(name, "list", None, parsed)
+        outdated = outdated_future.result() if outdated_future else None
+        if outdated is not None: self.verify_individually(apply_outdated_versions(apps, outdated), verify_executor, use_cache)
+        elif outdated_future: self.verify_individually(apps, verify_executor, use_cache) # Batch check failed, fall back
+        return apps
+
+    def verify_individually(self, apps, verify_executor, use_cache=True):
+        for app in apps:
+            if app.get('update_available') and app['manager'] == 'winget': verify_executor.submit(self.check_single_app_update, app, use_cache)
+
+    def fetch_outdated(self, name, use_cache=True):
+        """Runs a manager's outdated_command once. Returns {package id: available version}, or None if the check failed."""
+        config = self.package_managers[name]
+        if use_cache and (outdated := self.command_cache.get(name, "outdated", None, self.cache_ttl(name, "outdated"))) is not None: return outdated
+        parser = PARSER_MAPPING.get(config.get("outdated_parser"))
+        if not parser: return None
+        try: returncode, output = self.run_command(format_command(config["outdated_command"]))
+        except Exception as e: print(f"Exception checking {name} for updates: {e}"); return None
+        rows = parser(output)
+        if not rows and returncode != 0: return None
+        outdated = {row['id'].lower(): row.get('available', '') for row in rows}
+        self.command_cache.put(name, "outdated", None, outdated)
+        return outdated
+
+    def query_installed_app(self, app):
+        """Re-lists a single package with its manager's query_command. Returns its fresh record, or None if it isn't
+        installed. Raises RuntimeError if the query failed, so a missing row is never mistaken for an uninstall."""
+        name, config = app['manager'], self.package_managers[app['manager']]
+        returncode, output = self.run_command(format_command(config["query_command"], package_id=app['id']))
+        rows = PARSER_MAPPING[config["list_parser"]](output)
+        record = find_package_row(rows, app['id'])
+        if record is None:
+            not_installed = QUERY_NOT_INSTALLED_PATTERNS.get(config["list_parser"])
+            if (not_installed and not_installed.search(output)) or (rows and returncode == 0): return None
+            raise RuntimeError(f"query exited with code {returncode} without a listing")
+        record['manager'] = name
+        if record.get('update_available') and name == 'winget': self.check_single_app_update(record, use_cache=False)
+        return record
+
+    def requery_apps(self, apps, action_type):
+        """Looks up only the packages an action touched. Returns [(app, fresh record or None once uninstalled)], or None
+        if any of them couldn't be confirmed and the whole list needs refreshing instead. The queries run concurrently."""
+        if len(apps) > REQUERY_MAX_APPS: return None # One full listing beats a process per package
+        for app in apps:
+            config = self.package_managers.get(app['manager'], {})
+            if "query_command" not in config or config.get("list_parser") not in PARSER_MAPPING: return None
+        with ThreadPoolExecutor(max_workers=max(1, min(len(apps), SHELL_POOL_SIZE))) as executor:
+            futures = {executor.submit(self.query_installed_app, app): app for app in apps}
+            patches = []
+            for future in as_completed(futures):
+                app = futures[future]
+                try: record = future.result()
+                except Exception as e: print(f"Exception querying {app['name']}: {e}"); return None
+                if (record is None) != (action_type == "uninstall"): return None # Not the state the action should have left behind
+                patches.append((app, record))
+        return patches
+
+    def patch_installed_apps(self, patches):
+        """Replaces, adds or removes single records after an action instead of refreshing every manager."""
+        if self.installed_refreshed_at is None: return # Nothing loaded yet; the first visit lists everything anyway
+        if self.installed_refresh_running: self.installed_dirty = True; return # Its results may predate the action
+        stale = {(app['manager'], app['id'].lower()) for pair in patches for app in pair if app}
+        apps = [app for app in self.all_installed_apps if (app['manager'], app['id'].lower()) not in stale]
+        apps.extend(record for _, record in patches if record)
+        self.all_installed_apps, self.sorted_installed_apps = apps, None
+        self.filter_and_display_installed_apps(keep_position=True)
+        self.thread_pool.submit(self.save_installed_snapshot, list(apps), self.installed_refreshed_at)
+
+    def clear_installed_apps(self):
+        self.all_installed_apps, self.sorted_installed_apps = [], None
+        self.installed_apps_list.set_items([])
+
+    def append_installed_apps(self, apps):
+        self.all_installed_apps.extend(apps); self.sorted_installed_apps = None
+        search_term = self.installed_search_entry.get().strip()
+        self.installed_apps_list.append_items(InstalledAppFilter(apps).filter(search_term) if search_term else apps)
+        self.update_status(f"Fetching list of installed apps... {len(self.all_installed_apps)} found so far.")
+
+    def restore_installed_snapshot(self):
+        """Shows the apps from the last completed refresh straight away, then revalidates them in the background."""
+        refreshed, apps = load_installed_snapshot()
+        if refreshed is None: return
+        self.all_installed_apps, self.sorted_installed_apps = apps, None
+        self.filter_and_display_installed_apps()
+        self.set_last_refreshed(refreshed)
+        self.populate_installed_apps_tab(use_cache=False, revalidate=True)
+
+    def apply_revalidated_apps(self, apps, refreshed):
+        # Rows whose app record is unchanged are left alone by the list; only changed ones are rebound.
+        self.all_installed_apps, self.sorted_installed_apps = apps, None
+        self.stop_task(self.refresh_button)
+        self.filter_and_display_installed_apps(keep_position=True)
+        self.finish_installed_refresh(refreshed)
+
+    def on_installed_apps_refreshed(self, refreshed):
+        self.sorted_installed_apps = None # Verification has changed update flags since the rows were appended
+        self.stop_task(self.refresh_button)
+        self.filter_and_display_installed_apps()
+        self.finish_installed_refresh(refreshed)
+
+    def finish_installed_refresh(self, refreshed):
+        self.installed_refresh_running = False
+        self.set_last_refreshed(refreshed)
+        # An action finished while this refresh was running, so its results may already be out of date.
+        if self.installed_dirty and self.tab_view.get() == "Installed Apps": self.populate_installed_apps_tab()
+        self.start_logo_prewarm()
+
+    def start_logo_prewarm(self):
+        """Once per session, fetches the logos of all installed apps behind the UI, pausing while rows wait for logos or a
+        refresh is running."""
+        if self.logo_prewarm_started: return
+        self.logo_prewarm_started = True
+        names = [app['name'] for app in self.all_installed_apps]
+        should_pause = lambda: bool(self.logo_scheduler.pending) or self.installed_refresh_running
+        threading.Thread(target=self.logo_store.prewarm, args=(names, LOGO_PREWARM_BACKGROUND_WORKERS, print, should_pause, self.logo_flights), daemon=True).start()
 
-    def check_single_app_update(self, app):
+    def set_last_refreshed(self, refreshed):
+        self.installed_refreshed_at = refreshed
+        self.last_refreshed_label.configure(text=f"Last refreshed: {time.strftime('%Y-%m-%d %H:%M', time.localtime(refreshed))}")
+
+    def check_single_app_update(self, app, use_cache=True):
         config = self.package_managers.get("winget", {})
         if "show_command" not in config: app['update_available'] = False; return
-        command = config["show_command"].format(package_id=app['id'])
         try:
-            process = subprocess.run(command, shell=True, capture_output=True, text=True, encoding='utf-8', errors='ignore', startupinfo=self.get_startupinfo())
-            if process.returncode == 0:
-                versions = parse_winget_show_output(process.stdout)
-                installed_v, latest_v = versions.get('installed'), versions.get('latest')
-                app['update_available'] = bool(installed_v and latest_v and version.parse(latest_v) > version.parse(installed_v))
-            else: app['update_available'] = False
+            versions = self.command_cache.get("winget", "show", app['id'], self.cache_ttl("winget", "show")) if use_cache else None
+            if versions is None:
+                returncode, output = self.run_command(format_command(config["show_command"], package_id=app['id']))
+                if returncode != 0: app['update_available'] = False; return
+                versions = parse_winget_show_output(output)
+                self.command_cache.put("winget", "show", app['id'], versions)
+            installed_v, latest_v = versions.get('installed'), versions.get('latest')
+            app['update_available'] = bool(installed_v and latest_v and version.parse(latest_v) > version.parse(installed_v))
         except Exception: app['update_available'] = False
 
-    def filter_and_display_installed_apps(self, event=None):
-        self.stop_task(self.refresh_button)
-        for widget in self.installed_apps_frame.winfo_children(): widget.destroy()
+    def on_installed_filter_key(self, event=None):
+        # Keys that don't change the text (arrows, modifiers) don't need a new view; the rest wait for a pause in typing
+        if self.installed_search_entry.get().casefold().strip() == self.installed_filter_term: return
+        if self.filter_after_id: self.after_cancel(self.filter_after_id)
+        self.filter_after_id = self.after(FILTER_DEBOUNCE_MS, self.filter_and_display_installed_apps)
 
-        search_term = self.installed_search_entry.get().lower().strip()
-        
-        if search_term:
-            apps_to_display = [app for app in self.all_installed_apps if search_term in app['name'].lower()]
-        else:
-            apps_to_display = self.all_installed_apps
+    def installed_apps_in_order(self):
+        """The installed apps sorted once per snapshot (updates first); filtering only picks a subset of this order."""
+        if self.sorted_installed_apps is None:
+            self.sorted_installed_apps = sorted(self.all_installed_apps, key=lambda x: (not x.get('update_available', False), x['name'].lower()))
+            self.installed_filter = InstalledAppFilter(self.sorted_installed_apps)
+        return self.sorted_installed_apps
+
+    def filter_and_display_installed_apps(self, event=None, keep_position=False):
+        if self.filter_after_id: self.after_cancel(self.filter_after_id); self.filter_after_id = None
+        search_term = self.installed_filter_term = self.installed_search_entry.get().casefold().strip()
+        self.filter_generation += 1
+        apps = self.installed_apps_in_order()
+        if not search_term: self.show_filtered_installed_apps(apps, self.filter_generation, keep_position); return
+        installed_filter, generation = self.installed_filter, self.filter_generation
+        if len(apps) < FILTER_OFF_THREAD_MIN_APPS:
+            self.show_filtered_installed_apps(installed_filter.filter(search_term), generation, keep_position); return
+        future = self.filter_executor.submit(installed_filter.filter, search_term)
+        future.add_done_callback(lambda f: not f.cancelled() and f.exception() is None and self.after(0, self.show_filtered_installed_apps, f.result(), generation, keep_position))
 
+    def show_filtered_installed_apps(self, apps_to_display, generation, keep_position=False):
+        if generation != self.filter_generation: return # A newer filter or snapshot has replaced this one
         if not apps_to_display:
-            ctk.CTkLabel(self.installed_apps_frame, text="No matching apps found.").pack(pady=20); return
+            self.installed_apps_list.set_items([], "No matching apps found."); return
         
+        self.update_installed_status(apps_to_display)
+        self.installed_apps_list.set_items(apps_to_display, keep_position=keep_position)
+
+    def update_installed_status(self, apps_to_display):
         updates_found = sum(1 for app in self.all_installed_apps if app.get('update_available'))
         self.update_status(f"Showing {len(apps_to_display)} of {len(self.all_installed_apps)} apps. ({updates_found} updates available)", "green")
-        
-        sorted_apps = sorted(apps_to_display, key=lambda x: (not x.get('update_available', False), x['name'].lower()))
-        for app in sorted_apps: self.create_app_entry(self.installed_apps_frame, app, "manage")
     
     # --- Package Actions ---
-    def start_package_action_thread(self, app_data, action_type, button_widget):
+    def start_package_action_thread(self, app_data, action_type):
         self.update_status(f"Starting {action_type} for {app_data['name']}...", "yellow")
-        self.start_task(button_widget)
-        threading.Thread(target=self.package_action_worker, args=(app_data, action_type, button_widget), daemon=True).start()
+        self.start_task()
+        self.set_app_busy(app_data, True)
+        threading.Thread(target=self.package_action_worker, args=(app_data, action_type), daemon=True).start()
 
-    def package_action_worker(self, app_data, action_type, button_widget):
+    def package_action_worker(self, app_data, action_type):
         package_id, manager, name = app_data['id'], app_data['manager'], app_data['name']
         config = self.package_managers.get(manager)
-        command_key, success, message = f"{action_type}_command", False, ""
+        command_key, success, message, patches = f"{action_type}_command", False, "", None
         if not config or command_key not in config:
-            self.after(0, self.on_action_complete, button_widget, name, action_type, False, "Command not configured.")
+            self.after(0, self.on_action_complete, app_data, action_type, False, "Command not configured.")
             return
-        command = config[command_key].format(package_id=package_id)
+        command = format_command(config[command_key], package_id=package_id)
         try:
-            process = subprocess.run(command, shell=True, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            process = subprocess.run(command, shell=isinstance(command, str), capture_output=True, text=True, encoding='utf-8', errors='ignore')
+            self.invalidate_installed_cache(manager)
             output = process.stdout + process.stderr
             if process.returncode == 0:
                 if "No applicable upgrade found" in output or "no packages found to upgrade" in output.lower():
@@ -305,13 +1566,19 @@ class AppStore(ctk.CTk):
                 message = output.strip().split('\n')[-1]
                 print(f"Error during {action_type} of {name}: {output}")
         except Exception as e: message = str(e); print(f"Exception during {action_type} of {name}: {e}")
-        self.after(0, self.on_action_complete, button_widget, name, action_type, success, message)
+        if success: patches = self.requery_apps([app_data], action_type)
+        self.after(0, self.on_action_complete, app_data, action_type, success, message, patches)
 
-    def on_action_complete(self, button_widget, app_name, action_type, success, message):
-        self.stop_task(button_widget)
+    def on_action_complete(self, app_data, action_type, success, message, patches=None):
+        app_name = app_data['name']
+        self.stop_task()
+        self.set_app_busy(app_data, False)
         if success:
+            if patches is not None: self.patch_installed_apps(patches)
+            else:
+                self.installed_dirty = True
+                if self.tab_view.get() == "Installed Apps": self.ensure_installed_apps_fresh()
             self.update_status(f"Successfully completed {action_type} for {app_name}!", "green")
-            if self.tab_view.get() == "Installed Apps": self.populate_installed_apps_tab()
         else:
             self.update_status(message if message else f"Failed to {action_type} {app_name}.", "red")
 
@@ -329,85 +1596,114 @@ class AppStore(ctk.CTk):
         for i, app in enumerate(apps_to_update):
             self.after(0, self.update_status, f"Updating {i+1}/{total}: {app['name']}...")
             config = self.package_managers.get(app['manager'])
-            command = config["update_command"].format(package_id=app['id'])
+            command = format_command(config["update_command"], package_id=app['id'])
             try:
-                subprocess.run(command, shell=True, check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore', startupinfo=self.get_startupinfo())
+                subprocess.run(command, shell=isinstance(command, str), check=True, capture_output=True, text=True, encoding='utf-8', errors='ignore', startupinfo=self.get_startupinfo())
             except subprocess.CalledProcessError as e:
                 self.after(0, self.update_status, f"Failed to update {app['name']}. Continuing...", "orange")
                 print(f"Update failed for {app['name']}:\n{e.stdout}\n{e.stderr}")
-        self.after(0, self.on_update_all_complete)
+            except OSError as e: # An argv command whose executable is missing or can't be started
+                self.after(0, self.update_status, f"Failed to update {app['name']}. Continuing...", "orange")
+                print(f"Update failed for {app['name']}: {e}")
+        for manager in {app['manager'] for app in apps_to_update}: self.invalidate_installed_cache(manager)
+        self.after(0, self.update_status, "Checking updated packages...")
+        self.after(0, self.on_update_all_complete, self.requery_apps(apps_to_update, "update"))
 
-    def on_update_all_complete(self):
-        messagebox.showinfo("Update All", "Update process finished. Refreshing list.")
+    def on_update_all_complete(self, patches=None):
+        messagebox.showinfo("Update All", "Update process finished." if patches is not None else "Update process finished. Refreshing list.")
         self.stop_task(self.update_all_button)
-        self.populate_installed_apps_tab()
-
-    def create_app_entry(self, parent_frame, app_data, mode):
-        frame = ctk.CTkFrame(parent_frame); frame.pack(fill="x", padx=5, pady=5)
-        frame.grid_columnconfigure(1, weight=1)
-        logo_label = ctk.CTkLabel(frame, text="", width=48, height=48)
-        logo_label.grid(row=0, column=0, rowspan=2, padx=10, pady=5)
-        self.fetch_logo_thread(app_data['name'], logo_label)
-        info_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        info_frame.grid(row=0, column=1, rowspan=2, sticky="w", padx=5)
-        name_label = ctk.CTkLabel(info_frame, text=app_data['name'], anchor="w", font=ctk.CTkFont(size=14, weight="bold"))
-        name_label.pack(anchor="w")
-        id_text = f"ID: {app_data['id']} (via {app_data['manager']})"
-        if 'version' in app_data: id_text += f" | v{app_data['version']}"
-        id_label = ctk.CTkLabel(info_frame, text=id_text, anchor="w", text_color="gray")
-        id_label.pack(anchor="w")
-        button_frame = ctk.CTkFrame(frame, fg_color="transparent")
-        button_frame.grid(row=0, column=2, rowspan=2, padx=10, pady=5)
-        if mode == "install":
-            install_btn = ctk.CTkButton(button_frame, text="Install", width=90)
-            install_btn.pack(); install_btn.configure(command=lambda d=app_data, b=install_btn: self.start_package_action_thread(d, 'install', b))
-        elif mode == "manage":
-            if app_data.get('update_available'):
-                update_btn = ctk.CTkButton(button_frame, text="Update", width=90, fg_color="#E67E22", hover_color="#D35400")
-                update_btn.pack(side="left", padx=(0, 5)); update_btn.configure(command=lambda d=app_data, b=update_btn: self.start_package_action_thread(d, 'update', b))
-            uninstall_btn = ctk.CTkButton(button_frame, text="Uninstall", width=90, fg_color="#c0392b", hover_color="#e74c3c")
-            uninstall_btn.pack(side="left"); uninstall_btn.configure(command=lambda d=app_data, b=uninstall_btn: self.start_package_action_thread(d, 'uninstall', b))
+        if patches is not None: self.patch_installed_apps(patches); return
+        self.installed_dirty = True
+        self.ensure_installed_apps_fresh()
+
+    def set_app_busy(self, app_data, busy):
+        # Row buttons are recycled between apps, so their state follows busy_apps rather than the widget that was clicked.
+        if busy: self.busy_apps.add(app_key(app_data))
+        else: self.busy_apps.discard(app_key(app_data))
+        self.search_results_list.render(); self.installed_apps_list.render()
 
     # --- Helpers & Logo Fetching ---
     def get_startupinfo(self):
-        startupinfo = subprocess.STARTUPINFO(); startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        return startupinfo
+        return process_startupinfo()
+
+    def cache_ttl(self, name, kind):
+        return self.package_managers.get(name, {}).get("cache_ttl", {}).get(kind, COMMAND_CACHE_TTLS[kind])
+
+    def invalidate_installed_cache(self, manager):
+        # Search results don't depend on what is installed; everything else about this manager might have changed.
+        self.command_cache.invalidate(manager, ("list", "outdated", "show"))
+
+    def iter_command_lines(self, command, timeout=COMMAND_TIMEOUT_SECONDS):
+        # Commands written for the pooled shell run on a warm host; anything else gets its own process.
+        script = self.shell_pool.unwrap(command) if self.shell_pool and isinstance(command, str) else None
+        if script is not None: return (yield from self.shell_pool.iter_lines(script, timeout))
+        return (yield from iter_process_lines(command, self.get_startupinfo(), timeout))
+
+    def run_command(self, command, timeout=COMMAND_TIMEOUT_SECONDS):
+        script = self.shell_pool.unwrap(command) if self.shell_pool and isinstance(command, str) else None
+        if script is not None: return self.shell_pool.run(script, timeout)
+        process = subprocess.run(command, shell=isinstance(command, str), capture_output=True, text=True, encoding='utf-8', errors='ignore', timeout=timeout, startupinfo=self.get_startupinfo())
+        return process.returncode, process.stdout
+
+    def stream_parsed_rows(self, command, parser_name, timeout=COMMAND_TIMEOUT_SECONDS, status=None):
+        """Yields parsed rows as the command prints them. status, if given, receives the command's exit code under "returncode"."""
+        parser = STREAM_PARSER_MAPPING.get(parser_name)
+        if parser: yield from parser(capture_returncode(self.iter_command_lines(command, timeout), status if status is not None else {}))
 
     def update_status(self, text, color="white"):
         self.status_label.configure(text=text, text_color=color)
 
     def fetch_logo_thread(self, app_name, image_label):
-        self.thread_pool.submit(self.logo_worker, app_name, image_label)
+        self.logo_scheduler.submit(logo_key(app_name), app_name, image_label)
 
-    def logo_worker(self, app_name, image_label):
-        if app_name in self.logo_cache: self.update_logo_safely(image_label, self.logo_cache[app_name]); return
-        img_path = os.path.join(IMAGE_CACHE_DIR, f"{re.sub('[^a-zA-Z0-9]', '', app_name)}.png")
-        if os.path.exists(img_path):
-            if img := self.load_image_from_path(img_path, app_name): self.update_logo_safely(image_label, img); return
-        try:
-            with DDGS() as ddgs:
-                results = list(ddgs.images(f"{app_name} logo icon filetype:png", max_results=1))
-                if results and (image_url := results[0].get('image')):
-                    response = requests.get(image_url, stream=True, timeout=10)
-                    response.raise_for_status()
-                    with open(img_path, 'wb') as f: f.write(response.content)
-                    if img := self.load_image_from_path(img_path, app_name): self.update_logo_safely(image_label, img); return
-        except Exception as e:
-            if "time" not in str(e).lower(): print(f"Could not fetch logo for {app_name}: {e}")
-        if "placeholder" not in self.logo_cache: self.load_image_from_path(PLACEHOLDER_ICON, "placeholder")
-        if "placeholder" in self.logo_cache: self.update_logo_safely(image_label, self.logo_cache["placeholder"])
-    
-    def update_logo_safely(self, label, image):
-        if ctk.CTk.winfo_exists(label): self.after(0, label.configure, {"image": image})
+    def run_logo_job(self, key, waiters):
+        def deliver(image):
+            # The prewarm may have led this fetch; it yields a bool, and the logo it stored is read back from the cache.
+            if image is not None and not isinstance(image, ctk.CTkImage): image = self.logo_worker(waiters[0][1])
+            for label, app_name in waiters:
+                if image: self.update_logo_safely(label, image, app_name)
+        # Rows asking for the same logo while it is being fetched all wait on that one fetch.
+        self.logo_flights.run(key, lambda: self.logo_worker(waiters[0][1]), deliver)
+
+    def logo_worker(self, app_name):
+        key = logo_key(app_name)
+        if image := self.logo_cache.get(key): return image
+        if thumbnail := self.logo_store.thumbnail(app_name, self.logo_size()): return self.make_logo_image(thumbnail, key)
+        if placeholder := self.logo_cache.get("placeholder") or self.load_image_from_path(PLACEHOLDER_ICON, "placeholder"):
+            # Apps known to have no logo aren't looked up again when their row is rebound; after a transient failure they are.
+            if self.logo_store.known_missing(key): self.logo_cache.put(key, placeholder)
+            return placeholder
+
+    def logo_size(self):
+        """The stored thumbnail size that matches the display scaling, so logos are shown without resampling."""
+        return LOGO_SIZES[-1] if ctk.ScalingTracker.get_widget_scaling(self) > 1 else LOGO_SIZES[0]
+
+    def update_logo_safely(self, label, image, app_name=None):
+        self.after(0, self.apply_logo, label, image, app_name)
+
+    def apply_logo(self, label, image, app_name):
+        # A recycled row may show a different app by the time its logo arrives
+        if label.winfo_exists() and (app_name is None or getattr(label, 'logo_key', app_name) == app_name): label.configure(image=image)
 
     def load_image_from_path(self, path, cache_key):
+        # Stored logos come from logo_store as thumbnails at display size; anything else (the placeholder) is fitted once here.
         try:
-            image = Image.open(path).convert("RGBA"); image.thumbnail((48, 48), Image.Resampling.LANCZOS)
-            ctk_image = ctk.CTkImage(light_image=image, dark_image=image, size=(48, 48))
-            self.logo_cache[cache_key] = ctk_image
-            return ctk_image
+            with Image.open(path) as image: image = image.convert("RGBA") if image.mode != "RGBA" else image.copy()
+            if image.size not in {(size, size) for size in LOGO_SIZES}: image = ImageOps.pad(image, (LOGO_SIZES[0], LOGO_SIZES[0]), Image.Resampling.LANCZOS)
         except Exception as e: print(f"Failed to load image from {path}: {e}"); return None
+        return self.make_logo_image(image, cache_key)
+
+    def make_logo_image(self, image, cache_key):
+        ctk_image = ctk.CTkImage(light_image=image, dark_image=image, size=(48, 48))
+        self.logo_cache.put(cache_key, ctk_image, image.width * image.height * 4 * 2) # The PIL image plus Tk's copy
+        return ctk_image
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tiwut Win AppStore")
+    parser.add_argument("--prewarm-logos", action="store_true", help="fetch logos for the apps in the installed-apps snapshot without opening the window, then exit")
+    parser.add_argument("--snapshot", default=INSTALLED_SNAPSHOT_FILE, help="snapshot to read app names from (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=LOGO_PREWARM_WORKERS, help="concurrent logo fetches (default: %(default)s)")
+    args = parser.parse_args()
+    if args.prewarm_logos: sys.exit(prewarm_logos_headless(args.snapshot, args.workers))
     app = AppStore()
     app.mainloop()
\ No newline at end of file